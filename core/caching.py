@@ -0,0 +1,212 @@
+"""Caching of whole rendered pages, per user, both on the server and in
+browsers.
+
+Each cached page depends on a few named scopes belonging to its user, such as
+``day:2018-05-04`` or ``project:12``. Every scope has a random token stored in
+the cache, and the tokens of a page's scopes are part of that page's key. When
+something is written, the scopes it affects are given new tokens, so the pages
+depending on them are never looked up again and simply expire.
+
+Browsers are sent an ETag built from the user's data version, a counter which
+goes up whenever any of their sessions or projects are written, so that they
+can be told their copy is still good before any of the page is built.
+
+Logged in users themselves can be kept in the users cache between requests,
+so that pages which only read data don't need to query the users table. A
+user's cached copy is dropped whenever they are saved, deleted or their data
+version goes up, which only reaches every process if the cache is shared
+between them."""
+
+import hashlib
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+CACHED_VIEWS = []
+USER_CACHE_VERSION = 1
+USER_CACHE_TIMEOUT = 600
+
+def page_cache():
+    """Returns the cache backend that pages are stored in."""
+
+    return caches["pages"]
+
+
+def scope_key(user_id, scope):
+    """The cache key holding the current token of one of a user's scopes."""
+
+    return "scope:{}:{}".format(user_id, scope)
+
+
+def bump(user_id, *scopes):
+    """Marks some of a user's scopes as changed, so that any cached page which
+    depends on them will no longer be used."""
+
+    page_cache().set_many({
+     scope_key(user_id, scope): uuid.uuid4().hex for scope in scopes
+    }, timeout=None)
+
+
+def scope_tokens(user_id, scopes):
+    """Gets the current tokens of some of a user's scopes. Scopes which don't
+    have a token yet, perhaps because it was evicted, are given a new one."""
+
+    cache = page_cache()
+    keys = [scope_key(user_id, scope) for scope in scopes]
+    tokens = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in tokens}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        tokens.update(missing)
+    return [tokens[key] for key in keys]
+
+
+def user_cache():
+    """The cache that logged in users are kept in."""
+
+    return caches["users"]
+
+
+def is_shared(cache):
+    """Checks whether a cache is seen by every process using it, rather than
+    being kept in the memory of each one. A dummy cache, which keeps nothing,
+    doesn't count."""
+
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def user_key(user_id):
+    """The cache key of a user's cached copy. It includes a version number,
+    which is raised if what is cached about users changes."""
+
+    return "user:{}:{}".format(USER_CACHE_VERSION, user_id)
+
+
+def cached_user(user_id):
+    """Gets the cached copy of a user, or ``None`` if there isn't one."""
+
+    return user_cache().get(user_key(user_id))
+
+
+def cache_user(user):
+    """Caches a copy of a user for later requests to use."""
+
+    user_cache().set(user_key(user.id), user, USER_CACHE_TIMEOUT)
+
+
+def forget_user(user_id):
+    """Drops the cached copy of a user, as they have changed."""
+
+    user_cache().delete(user_key(user_id))
+
+
+def count(outcome, view_name):
+    """Adds one to the hit or miss counter of a view."""
+
+    cache, key = page_cache(), "count:{}:{}".format(outcome, view_name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError: pass
+
+
+def stats():
+    """Returns the hit and miss counts of every cached view, as a dict of
+    view names to ``(hits, misses)`` tuples."""
+
+    counts = page_cache().get_many([
+     "count:{}:{}".format(outcome, name)
+     for name in CACHED_VIEWS for outcome in ("hit", "miss")
+    ])
+    return {name: (
+     counts.get("count:hit:" + name, 0), counts.get("count:miss:" + name, 0)
+    ) for name in CACHED_VIEWS}
+
+
+def cached_page(get_scopes):
+    """A decorator which caches a view's rendered pages per user. It takes a
+    function which is given the view's arguments and returns the scopes the
+    page depends on, or ``None`` if the page shouldn't be cached.
+
+    The key also covers the URL, the user's settings, the timezone the page is
+    actually rendered in, which comes from the login session and can lag
+    behind the user's setting, and the current local date, which pages use to
+    hide the future. Only GET requests from logged in
+    users which already have a CSRF cookie are cached, as the page contains a
+    CSRF token that must match it. Nothing is cached if the page cache is a
+    dummy, as it is in production unless a shared one is set up."""
+
+    def decorator(view):
+        name = "{}.{}".format(view.__module__, view.__name__)
+        CACHED_VIEWS.append(name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+            user = request.user
+            cache = page_cache()
+            if isinstance(cache, DummyCache): return view(request, *args, **kwargs)
+            if request.method != "GET" or not csrf or not user.is_authenticated:
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            if scopes is None: return view(request, *args, **kwargs)
+            key = "page:{}:{}".format(user.id, hashlib.sha1(repr((
+             name, request.get_full_path(), args, sorted(kwargs.items()),
+             str(user.timezone), timezone.get_current_timezone_name(),
+             user.project_order, request.now.date(), csrf,
+             scope_tokens(user.id, scopes)
+            )).encode()).hexdigest())
+            content = cache.get(key)
+            if content is not None:
+                count("hit", name)
+                return HttpResponse(content)
+            count("miss", name)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response.content)
+            return response
+        return wrapper
+    return decorator
+
+
+def user_etag(request, *args, **kwargs):
+    """Works out the ETag of a page for a logged in user, without touching the
+    database. Anything else that a page can show which could change without
+    the user's data version going up is included as well, including the
+    timezone the page is rendered in. As with cached
+    pages, only logged in users with a CSRF cookie get an ETag."""
+
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    user = request.user
+    if not csrf or not user.is_authenticated: return None
+    return hashlib.sha1(repr((
+     request.get_full_path(), args, sorted(kwargs.items()), user.id,
+     user.data_version, str(user.timezone),
+     timezone.get_current_timezone_name(), user.project_order, user.email,
+     request.now.date(), csrf
+    )).encode()).hexdigest()
+
+
+def conditional_page(view):
+    """A decorator which lets a view answer a conditional GET with a 304 if the
+    browser's copy has the current ETag, before the view itself runs. Pages
+    with an ETag are marked as private, and as needing to be checked with the
+    server before being reused."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = user_etag(request, *args, **kwargs)
+        if etag is None: return view(request, *args, **kwargs)
+        response = condition(etag_func=lambda *args, **kwargs: etag)(view)(
+         request, *args, **kwargs
+        )
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
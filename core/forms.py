@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth import authenticate, login
 from django.core.validators import MinLengthValidator
 from .models import User
+from projects.models import DayTotal
 
 class SignupForm(forms.ModelForm):
     """The form users-to-be use to create a new account.
@@ -77,6 +78,16 @@ class TimeSettingsForm(forms.ModelForm):
         fields = ("timezone", "project_order")
 
 
+    def save(self, *args, **kwargs):
+        """Saves the settings. If the timezone has changed, the user's daily
+        totals are rebuilt, as they are bucketed by local date."""
+
+        user = forms.ModelForm.save(self, *args, **kwargs)
+        if "timezone" in self.changed_data:
+            DayTotal.objects.rebuild(user)
+        return user
+
+
 
 class AccountSettingsForm(forms.ModelForm):
 
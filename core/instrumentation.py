@@ -0,0 +1,119 @@
+"""Measuring of where the time goes while a request is handled - how many SQL
+queries are made and how long they take, and how long templates take to
+render. The figures for the request being handled on a thread are gathered in
+a ``RequestStats`` object by ``InstrumentationMiddleware``, a database
+execute wrapper and a template backend which times its templates."""
+
+import json
+import logging
+import threading
+from math import ceil
+from time import perf_counter
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.urls import get_resolver, URLResolver
+
+logger = logging.getLogger("core.instrumentation")
+local = threading.local()
+
+class RequestStats:
+    """The figures gathered for one request. Times are in seconds."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.began = perf_counter()
+
+
+
+def start():
+    """Starts gathering figures for a new request on this thread."""
+
+    local.stats = RequestStats()
+    return local.stats
+
+
+def stop():
+    """Stops gathering figures on this thread, and returns those gathered."""
+
+    stats, local.stats = getattr(local, "stats", None), None
+    return stats
+
+
+def time_query(execute, sql, params, many, context):
+    """A database execute wrapper which counts and times queries."""
+
+    began = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = getattr(local, "stats", None)
+        if stats:
+            stats.queries += 1
+            stats.sql_time += perf_counter() - began
+
+
+def url_pattern(path, patterns=None, prefix=""):
+    """Finds the route of the URL pattern which a path (without its leading
+    slash) resolves to, such as ``time/<slug:month>/``, or ``None``."""
+
+    if patterns is None: patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        match = pattern.pattern.match(path)
+        if match:
+            route = prefix + str(pattern.pattern)
+            if not isinstance(pattern, URLResolver): return route
+            route = url_pattern(match[0], pattern.url_patterns, route)
+            if route: return route
+
+
+def percentile(values, percent):
+    """The nearest-rank percentile of a sorted list of values."""
+
+    return values[max(ceil(len(values) * percent / 100), 1) - 1]
+
+
+def log_request(request, response, stats, total_time):
+    """Writes one request's figures to the log as a line of JSON."""
+
+    match = getattr(request, "resolver_match", None)
+    logger.info(json.dumps({
+     "route": url_pattern(request.path_info[1:]),
+     "view": match._func_path if match else None,
+     "method": request.method, "status": response.status_code,
+     "queries": stats.queries, "sql_ms": round(stats.sql_time * 1000, 2),
+     "template_ms": round(stats.template_time * 1000, 2),
+     "total_ms": round(total_time * 1000, 2)
+    }))
+
+
+
+class TimedTemplate(Template):
+    """A Django template which adds the time it takes to render to the current
+    request's figures."""
+
+    def render(self, context=None, request=None):
+        began = perf_counter()
+        try:
+            return Template.render(self, context, request)
+        finally:
+            stats = getattr(local, "stats", None)
+            if stats: stats.template_time += perf_counter() - began
+
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, but giving out templates which time their
+    rendering. Templates included by other templates are rendered as part of
+    them, so their time isn't counted twice."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,94 @@
+import json
+from datetime import date, datetime, timedelta
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.utils import timezone as tz
+from core.instrumentation import percentile
+from core.models import User
+from projects.models import Day, Session
+
+class Command(BaseCommand):
+    """Times the rendering of a month of sessions, as sent by the month view,
+    from sessions made up in memory so that no database work is counted. The
+    template is loaded and compiled once, which is timed on its own, and then
+    rendered over and over."""
+
+    help = "Measures how long a month of sessions takes to render"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+         "--days", type=int, default=31, help="How many days the month has"
+        )
+        parser.add_argument(
+         "--sessions", type=int, default=10, help="How many sessions each day has"
+        )
+        parser.add_argument(
+         "--repeat", type=int, default=50, help="How many times to render it"
+        )
+        parser.add_argument("--output", help="A JSON file to write the figures to")
+
+
+    def handle(self, *args, **options):
+        if min(options["days"], options["sessions"], options["repeat"]) < 1:
+            raise CommandError("The numbers given must be positive")
+        user = User(id=1, username="sam", timezone="Europe/London")
+        month = date(2019, 1, 1)
+        request = RequestFactory().get(month.strftime("/time/%Y-%m/"))
+        request.user = user
+        with tz.override(user.timezone):
+            request.now = tz.localtime()
+            context = {
+             "days": self.make_days(month, options["days"], options["sessions"]),
+             "project": None, "month_date": month, "older": None, "newer": None
+            }
+            began = perf_counter()
+            template = get_template("time.html")
+            compiled = (perf_counter() - began) * 1000
+            times = []
+            for _ in range(options["repeat"]):
+                began = perf_counter()
+                html = template.render(context, request)
+                times.append((perf_counter() - began) * 1000)
+        times.sort()
+        results = {
+         "days": options["days"], "sessions_per_day": options["sessions"],
+         "renders": len(times), "bytes": len(html.encode()),
+         "load_ms": round(compiled, 2),
+         "mean_ms": round(sum(times) / len(times), 2),
+         "p50_ms": round(percentile(times, 50), 2),
+         "p95_ms": round(percentile(times, 95), 2)
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write("\n")
+        self.stdout.write(
+         "{days} days of {sessions_per_day} sessions, {bytes} bytes: "
+         "load {load_ms:.1f} ms, render p50 {p50_ms:.2f} ms, "
+         "p95 {p95_ms:.2f} ms, mean {mean_ms:.2f} ms".format(**results)
+        )
+
+
+    def make_days(self, month, days, sessions):
+        """Makes ``Day`` objects of unsaved sessions for a month, newest first,
+        as the month view sends them."""
+
+        made = []
+        for n in reversed(range(days)):
+            day = month + timedelta(days=n)
+            morning = tz.make_aware(datetime.combine(day, datetime.min.time()))
+            day_sessions = []
+            for s in range(sessions):
+                session = Session(
+                 id=n * sessions + s + 1, breaks=(0, 10)[s % 2],
+                 start=morning + timedelta(hours=8, minutes=s * 50),
+                 end=morning + timedelta(hours=8, minutes=s * 50 + 45),
+                 notes="Notes <{}>".format(s) if s % 3 else "",
+                 project_id=s + 1, duration_minutes=(45, 35)[s % 2]
+                )
+                session.project_name = "Project {}".format(s + 1)
+                day_sessions.append(session)
+            made.append(Day(day_sessions, day=day))
+        return made
@@ -0,0 +1,149 @@
+import json
+import subprocess
+from datetime import datetime
+from time import perf_counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone as tz
+from core.instrumentation import percentile
+from core.models import User
+from projects.models import Project, Session
+
+VIEWS = ("day", "month", "project", "projects", "profile")
+
+class Command(BaseCommand):
+    """Requests the main pages of the site as some users, through Django's
+    test client, and writes out how long they took and how many SQL queries
+    they made as JSON, so that the figures from two commits can be compared.
+    Each user's pages are for their latest day and month of work and their
+    busiest project. Every page is requested once before being measured, so
+    that things done only once per process aren't counted. That first request
+    sets a CSRF cookie, so the page cache is swapped for a dummy during the
+    run, and every timed request renders its page in full."""
+
+    help = "Measures the time and queries of the main pages as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+         "usernames", nargs="*",
+         help="The users to request pages as, rather than generated ones"
+        )
+        parser.add_argument(
+         "--prefix", default="load-",
+         help="What the usernames of the generated users start with"
+        )
+        parser.add_argument(
+         "--repeat", type=int, default=20,
+         help="How many times to request each page for each user"
+        )
+        parser.add_argument(
+         "--output", default="benchmark.json", help="The JSON file to write"
+        )
+
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("The repeat count must be positive")
+        users = User.objects.filter(
+         username__in=options["usernames"]
+        ) if options["usernames"] else User.objects.filter(
+         username__startswith=options["prefix"]
+        )
+        users = [(user, self.urls(user)) for user in users.order_by("id")]
+        users = [(user, urls) for user, urls in users if urls]
+        if not users: raise CommandError("No users with sessions to request as")
+        times, queries = {view: [] for view in VIEWS}, {view: [] for view in VIEWS}
+        with override_settings(ALLOWED_HOSTS=["testserver"], CACHES=dict(
+         settings.CACHES,
+         pages={"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        )):
+            client = Client()
+            for user, urls in users:
+                client.force_login(user)
+                for view, url in urls.items():
+                    self.request(client, url)
+                    for _ in range(options["repeat"]):
+                        took, made = self.request(client, url)
+                        times[view].append(took)
+                        queries[view].append(made)
+        results = {
+         "commit": commit(), "created": datetime.now().isoformat(),
+         "users": len(users), "repeat": options["repeat"],
+         "views": {view: summarise(times[view], queries[view]) for view in VIEWS}
+        }
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        self.stdout.write("{:<10} {:>9} {:>9} {:>9} {:>8}".format(
+         "View", "p50 ms", "p95 ms", "p99 ms", "Queries"
+        ))
+        for view in VIEWS:
+            figures = results["views"][view]
+            self.stdout.write("{:<10} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.1f}".format(
+             view, figures["p50_ms"], figures["p95_ms"], figures["p99_ms"],
+             figures["queries_mean"]
+            ))
+
+
+    def urls(self, user):
+        """The URL of each view for a user, or ``None`` if they have no
+        sessions.
+
+        SQL queries: 2"""
+
+        latest = Session.objects.filter(user=user).order_by("-start").first()
+        if not latest: return None
+        day = tz.localtime(latest.start, user.timezone).date()
+        project = Project.objects.filter(user=user).order_by(
+         "-session_count", "id"
+        ).first()
+        return {
+         "day": day.strftime("/day/%Y-%m-%d/"),
+         "month": day.strftime("/time/%Y-%m/"),
+         "project": "/projects/{}/".format(project.id),
+         "projects": "/projects/", "profile": "/profile/"
+        }
+
+
+    def request(self, client, url):
+        """Requests a page, and returns how many milliseconds it took and how
+        many SQL queries it made."""
+
+        with CaptureQueriesContext(connection) as queries:
+            began = perf_counter()
+            response = client.get(url)
+            took = (perf_counter() - began) * 1000
+        if response.status_code != 200:
+            raise CommandError("{} gave a {}".format(url, response.status_code))
+        return took, len(queries)
+
+
+
+def summarise(times, queries):
+    """Turns the times and query counts of a view's requests into the figures
+    written out for it."""
+
+    times, queries = sorted(times), sorted(queries)
+    return {
+     "requests": len(times), "mean_ms": round(sum(times) / len(times), 2),
+     "p50_ms": round(percentile(times, 50), 2),
+     "p95_ms": round(percentile(times, 95), 2),
+     "p99_ms": round(percentile(times, 99), 2),
+     "max_ms": round(times[-1], 2),
+     "queries_mean": round(sum(queries) / len(queries), 2),
+     "queries_max": queries[-1]
+    }
+
+
+def commit():
+    """The git commit being measured, if it can be found."""
+
+    try:
+        return subprocess.run(
+         ["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+         stderr=subprocess.DEVNULL, universal_newlines=True
+        ).stdout.strip() or None
+    except OSError: return None
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+import core.urls
+from core.caching import stats
+
+class Command(BaseCommand):
+    """Prints how often each cached view was served from the page cache. The
+    counts are kept in the cache itself, so with the local memory backend they
+    only cover the process they are read from."""
+
+    help = "Shows the page cache hit rate of each cached view"
+
+    def handle(self, *args, **options):
+        for name, (hits, misses) in sorted(stats().items()):
+            total = hits + misses
+            self.stdout.write("{}: {} hits, {} misses ({})".format(
+             name, hits, misses,
+             "{:.1%} hit rate".format(hits / total) if total else "unused"
+            ))
@@ -0,0 +1,63 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.instrumentation import percentile
+
+class Command(BaseCommand):
+    """Summarises the request log written by ``InstrumentationMiddleware``,
+    giving the 50th, 95th and 99th percentiles of the total time of requests
+    to each URL pattern, along with their SQL query counts and times. Lines
+    which aren't request records are skipped, so the log can have other
+    messages or prefixes such as timestamps in it."""
+
+    help = "Reports request time percentiles per URL pattern from request logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="The request log files")
+
+
+    def handle(self, *args, **options):
+        routes = {}
+        for path in options["paths"]:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        record = self.parse(line)
+                        if record:
+                            routes.setdefault(
+                             record.get("route") or "(unmatched)", []
+                            ).append(record)
+            except OSError as e:
+                raise CommandError(str(e))
+        if not routes:
+            self.stdout.write("No requests found")
+            return
+        self.stdout.write("{:<32} {:>7} {:>9} {:>9} {:>9} {:>8} {:>8} {:>9}".format(
+         "Route", "Count", "p50 ms", "p95 ms", "p99 ms", "Queries", "p95 q",
+         "SQL ms"
+        ))
+        for route, records in sorted(
+         routes.items(), key=lambda item: -len(item[1])
+        ):
+            totals = sorted(r["total_ms"] for r in records)
+            queries = sorted(r["queries"] for r in records)
+            self.stdout.write(
+             "{:<32} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.1f} {:>8} {:>9.1f}".format(
+              route, len(records), percentile(totals, 50),
+              percentile(totals, 95), percentile(totals, 99),
+              sum(queries) / len(queries), percentile(queries, 95),
+              sum(r["sql_ms"] for r in records) / len(records)
+             )
+            )
+
+
+    def parse(self, line):
+        """Gets the request record from a log line, or ``None`` if the line
+        doesn't hold one."""
+
+        try:
+            record = json.loads(line[line.index("{"):])
+        except ValueError: return None
+        if isinstance(record, dict) and {
+         "total_ms", "queries", "sql_ms"
+        } <= set(record):
+            return record
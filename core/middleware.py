@@ -1,15 +1,156 @@
 import pytz
 from datetime import datetime
+from functools import lru_cache
+from time import perf_counter
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from core import caching, instrumentation
+
+TIMEZONE_SESSION_KEY = "timezone"
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """Gets the pytz timezone with the given name, remembering it so that it
+    is only looked up once per process."""
+
+    return pytz.timezone(name)
+
+
+def remember_timezone(request, user):
+    """Stores the name of a user's timezone in their login session, so that
+    later requests can activate it without loading the user. This is done when
+    they log in and when they change their timezone."""
+
+    request.session[TIMEZONE_SESSION_KEY] = str(user.timezone)
+
+
+
+def get_cached_user(request):
+    """Gets the user of a request from the cache if they are there, and
+    otherwise loads them as Django normally would and caches them. A cached
+    user is only used if the session's password hash still matches theirs,
+    so that changing a password logs out other sessions as usual."""
+
+    if not hasattr(request, "_cached_user"):
+        try:
+            user_id = int(request.session[SESSION_KEY])
+            backend = request.session[BACKEND_SESSION_KEY]
+        except (KeyError, ValueError):
+            request._cached_user = AnonymousUser()
+            return request._cached_user
+        user = caching.cached_user(user_id)
+        if user is None or backend not in settings.AUTHENTICATION_BACKENDS:
+            user = auth.get_user(request)
+            if user.is_authenticated: caching.cache_user(user)
+        elif constant_time_compare(
+         request.session.get(HASH_SESSION_KEY) or "", user.get_session_auth_hash()
+        ):
+            user.backend = backend
+        else:
+            request.session.flush()
+            user = AnonymousUser()
+        request._cached_user = user
+    return request._cached_user
+
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """A replacement for Django's ``AuthenticationMiddleware`` which keeps
+    logged in users in the cache, so that most requests don't need to query
+    the users table. It is opt-in, and refuses to start unless the users
+    cache is shared between processes, so that a change to a user made
+    through one of them is seen by all of them."""
+
+    def __init__(self, get_response=None):
+        if not caching.is_shared(caching.user_cache()):
+            raise ImproperlyConfigured(
+             "CachedAuthenticationMiddleware needs a users cache which is shared "
+             "between processes, such as a file or memcached cache"
+            )
+        AuthenticationMiddleware.__init__(self, get_response)
+
+
+    def process_request(self, request):
+        AuthenticationMiddleware.process_request(self, request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
 
 class TimezoneMiddleware(MiddlewareMixin):
 
     def process_request(self, request):
         """When a request comes in, activate the user's timezone to override the
         settings default, and add the current time in the user's local time to
-        the request."""
-        
-        try: timezone.activate(request.user.timezone)
-        except: pass
+        the request.
+
+        The timezone is read from the login session, so the user only has to be
+        loaded if it isn't stored there yet, in which case it is stored for
+        next time. Anonymous requests just use the default timezone."""
+
+        session = getattr(request, "session", {})
+        if SESSION_KEY not in session:
+            timezone.deactivate()
+        else:
+            if TIMEZONE_SESSION_KEY not in session and request.user.is_authenticated:
+                remember_timezone(request, request.user)
+            try:
+                timezone.activate(get_timezone(session[TIMEZONE_SESSION_KEY]))
+            except (KeyError, pytz.UnknownTimeZoneError):
+                timezone.deactivate()
         request.now = timezone.localtime()
+
+
+    def process_response(self, request, response):
+        """If the view loaded the user anyway and their timezone no longer
+        matches the one stored in the session, perhaps because it was changed
+        from another device, the session is brought up to date."""
+
+        user = getattr(request, "_cached_user", None)
+        if user is not None and user.is_authenticated and getattr(
+         request, "session", {}
+        ).get(TIMEZONE_SESSION_KEY) not in (None, str(user.timezone)):
+            remember_timezone(request, user)
+        return response
+
+
+
+class InstrumentationMiddleware:
+    """Records how many SQL queries each request makes, how long they and the
+    rendering of templates take, and how long the whole request takes. The
+    figures are sent back in a ``Server-Timing`` header and written to the
+    ``core.instrumentation`` log as a line of JSON, which the
+    ``request_timings`` command can summarise.
+
+    It is opt-in, and should come first so that it times everything else.
+    Template time is only recorded when the template backend is
+    ``core.instrumentation.TimedDjangoTemplates``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+
+    def __call__(self, request):
+        stats = instrumentation.start()
+        try:
+            with connection.execute_wrapper(instrumentation.time_query):
+                response = self.get_response(request)
+        finally:
+            instrumentation.stop()
+        total_time = perf_counter() - stats.began
+        response["Server-Timing"] = ", ".join((
+         'sql;dur={:.2f};desc="{} queries"'.format(
+          stats.sql_time * 1000, stats.queries
+         ), "tpl;dur={:.2f}".format(stats.template_time * 1000),
+         "total;dur={:.2f}".format(total_time * 1000)
+        ))
+        instrumentation.log_request(request, response, stats, total_time)
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.13 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_project_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='data_version',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -5,6 +5,9 @@ from timezone_field import TimeZoneField
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone as tz
 from django.db import models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from core import caching
 
 class User(AbstractUser):
     """The User model for pontefract. Email is required"""
@@ -19,6 +22,35 @@ class User(AbstractUser):
     project_order = models.CharField(
      max_length=2, choices=PROJECT_ORDER_CHOICES, default="TD"
     )
+    data_version = models.IntegerField(default=0, editable=False)
+
+
+    @classmethod
+    def bump_data_version(cls, user_id):
+        """Increments the counter of a user's data, which is done whenever one
+        of their sessions or projects is written so that pages built from the
+        old data can be recognised as stale.
+
+        SQL queries: 1"""
+
+        cls.objects.filter(id=user_id).update(data_version=F("data_version") + 1)
+        caching.forget_user(user_id)
+
+
+    def save(self, *args, **kwargs):
+        """Saves the user, dropping any cached copy of them."""
+
+        AbstractUser.save(self, *args, **kwargs)
+        caching.forget_user(self.id)
+
+
+    def delete(self, *args, **kwargs):
+        """Deletes the user, dropping any cached copy of them."""
+
+        user_id = self.id
+        deleted = AbstractUser.delete(self, *args, **kwargs)
+        caching.forget_user(user_id)
+        return deleted
 
 
     def project_count(self):
@@ -29,8 +61,12 @@ class User(AbstractUser):
 
 
     def total_time(self):
-        """Returns the number of minutes in the user's sessions."""
+        """Returns the number of minutes in the user's sessions, from the
+        stored totals of their projects.
+
+        SQL queries: 1"""
 
-        from projects.models import Session
-        sessions = Session.objects.filter(project__user=self)
-        return sum(session.duration() for session in sessions)
+        from projects.models import Project
+        return Project.objects.filter(user=self).aggregate(
+         total=Coalesce(Sum("total_minutes"), 0)
+        )["total"]
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+ "django.middleware.gzip.GZipMiddleware",
  "django.contrib.sessions.middleware.SessionMiddleware",
  "django.middleware.common.CommonMiddleware",
  "django.middleware.csrf.CsrfViewMiddleware",
@@ -29,9 +30,48 @@ MIDDLEWARE = [
  "core.middleware.TimezoneMiddleware"
 ]
 
+CACHES = {
+ "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+ "pages": {
+  "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+  "LOCATION": "pages",
+  "TIMEOUT": 60 * 60 * 24,
+  "OPTIONS": {"MAX_ENTRIES": 5000}
+ },
+ "users": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+}
+# Pages are marked stale only in the cache of the process which wrote to them,
+# so the page cache must be shared by every process serving the site. In DEBUG
+# one process's memory will do, but otherwise pages are only cached if
+# PAGE_CACHE_DIR gives a directory that every worker can share.
+if os.environ.get("PAGE_CACHE_DIR"):
+    CACHES["pages"]["BACKEND"] = "django.core.cache.backends.filebased.FileBasedCache"
+    CACHES["pages"]["LOCATION"] = os.environ["PAGE_CACHE_DIR"]
+elif not DEBUG:
+    CACHES["pages"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+
+# Setting USER_CACHE_DIR to a directory keeps logged in users in files there
+# between requests, so that most pages needn't query the users table. Every
+# worker process must share the directory, or a change to a user made through
+# one of them would go unseen by the rest.
+if os.environ.get("USER_CACHE_DIR"):
+    CACHES["users"] = {
+     "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+     "LOCATION": os.environ["USER_CACHE_DIR"]
+    }
+    MIDDLEWARE[MIDDLEWARE.index(
+     "django.contrib.auth.middleware.AuthenticationMiddleware"
+    )] = "core.middleware.CachedAuthenticationMiddleware"
+
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.abspath(os.path.join(BASE_DIR, "../static"))
 
+# Outside of DEBUG, collected static files get hashed names, so the web server
+# can let browsers cache them forever, and gzip and Brotli copies to send as
+# they are.
+if not DEBUG:
+    STATICFILES_STORAGE = "core.storage.CompressedManifestStaticFilesStorage"
+
 SASS_PROCESSOR_ROOT = os.path.abspath(os.path.join(BASE_DIR, "core", "static"))
 
 AUTH_USER_MODEL = "core.User"
@@ -42,12 +82,37 @@ TIME_FORMAT = "H:i"
 DATE_FORMAT = "l j F, Y"
 TEMPLATES = [{
  "BACKEND": "django.template.backends.django.DjangoTemplates",
- "APP_DIRS": True,
  "OPTIONS": {
   "context_processors": [
    "django.contrib.auth.context_processors.auth",
    "django.template.context_processors.request"
   ],
   "builtins": ["core.templatetags"],
+  "loaders": ["django.template.loaders.app_directories.Loader"]
  },
 }]
+
+# Outside of DEBUG, templates are found and compiled once per process and then
+# kept, rather than being read and parsed again on every request.
+if not DEBUG:
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [(
+     "django.template.loaders.cached.Loader", TEMPLATES[0]["OPTIONS"]["loaders"]
+    )]
+
+# Setting REQUEST_LOG to a file path turns on the recording of each request's
+# SQL, template and total times, which are logged there as lines of JSON.
+if os.environ.get("REQUEST_LOG"):
+    MIDDLEWARE.insert(0, "core.middleware.InstrumentationMiddleware")
+    TEMPLATES[0]["BACKEND"] = "core.instrumentation.TimedDjangoTemplates"
+    LOGGING = {
+     "version": 1,
+     "disable_existing_loggers": False,
+     "formatters": {"message": {"format": "%(message)s"}},
+     "handlers": {"requests": {
+      "class": "logging.FileHandler", "filename": os.environ["REQUEST_LOG"],
+      "formatter": "message"
+     }},
+     "loggers": {"core.instrumentation": {
+      "handlers": ["requests"], "level": "INFO", "propagate": False
+     }}
+    }
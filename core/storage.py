@@ -0,0 +1,55 @@
+"""Storage of static files for production. Files are given names containing a
+hash of their content, so that they can be cached by browsers forever, and
+compressed copies of the ones that compress well are written alongside them
+for the web server to send as they are."""
+
+import gzip
+import io
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+ ".css", ".js", ".map", ".svg", ".json", ".xml", ".txt", ".html", ".ico",
+ ".webmanifest"
+)
+
+def compressed_versions(content):
+    """Compresses some bytes as much as possible, and returns a dict of file
+    extensions to the compressed bytes - ``.gz`` for gzip, and ``.br`` for
+    Brotli if it is installed. Compressions which don't make the content
+    smaller are left out. Gzip's timestamp is zeroed so that unchanged files
+    compress to the same bytes."""
+
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(content)
+    versions = {".gz": buffer.getvalue()}
+    if brotli: versions[".br"] = brotli.compress(content)
+    return {ext: data for ext, data in versions.items() if len(data) < len(content)}
+
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Static file storage which, as ``collectstatic`` finishes, writes
+    compressed copies of each text file it has collected, both under their
+    own names and under their hashed names."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in ManifestStaticFilesStorage.post_process(
+         self, paths, dry_run=dry_run, **options
+        ):
+            if hashed_name: names |= {name, hashed_name}
+            yield name, hashed_name, processed
+        if dry_run: return
+        for name in sorted(names):
+            if not name.lower().endswith(COMPRESSIBLE): continue
+            with self.open(name) as f:
+                content = f.read()
+            for ext, data in compressed_versions(content).items():
+                if self.exists(name + ext): self.delete(name + ext)
+                self._save(name + ext, ContentFile(data))
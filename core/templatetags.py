@@ -1,19 +1,60 @@
 from django import template
 from datetime import date, timedelta
+from functools import lru_cache
+from django.utils import timezone as tz
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 
 register = template.Library()
+SESSION_ROW = (
+ '<div class="session" data-id="{id}">'
+ '<div class="cell time-cell"><a href="/sessions/{id}/edit/" class="edit-link">'
+ '{start} - {end}</a></div>'
+ '<div class="cell notes-cell">{notes}</div>'
+ '<div class="cell name-cell"><a class="project-link" href="/projects/'
+ '{project_id}/">{project_name}</a></div>'
+ '<div class="cell duration-cell">{duration}</div>'
+ '<div class="cell breaks-cell">{breaks}</div>'
+ '</div>'
+)
+NOTES_BUTTON = '<button class="notes-button" data-notes="{}"></button>'
 
 @register.filter(name="time_string")
-def time_string(minutes):
+@lru_cache(maxsize=2048)
+def time_string(minutes, style=None):
     """Turns a number of minutes into a human readable description of that
-    duration."""
-    
-    if minutes < 60:
-        return "{} minute{}".format(minutes, "" if minutes == 1 else "s")
-    else:
-        hours = minutes // 60
-        mins = minutes - (hours * 60)
-        text = "{} hour{}".format(hours, "" if hours == 1 else "s")
-        if mins:
-            text += ", {} minute{}".format(mins, "" if mins == 1 else "s")
-        return text
+    duration, such as ``1 hour, 30 minutes``, or ``1h 30m`` if the style is
+    ``compact``. Negative durations are given a minus sign.
+
+    Pages show the same few durations over and over, so the most recent
+    answers are remembered."""
+
+    if minutes < 0: return "-" + time_string(-minutes, style)
+    hours, mins = divmod(minutes, 60)
+    if style == "compact":
+        if not hours: return "{}m".format(mins)
+        return "{}h {}m".format(hours, mins) if mins else "{}h".format(hours)
+    if not hours:
+        return "{} minute{}".format(mins, "" if mins == 1 else "s")
+    text = "{} hour{}".format(hours, "" if hours == 1 else "s")
+    if mins:
+        text += ", {} minute{}".format(mins, "" if mins == 1 else "s")
+    return text
+
+
+@register.simple_tag
+def session_row(session):
+    """Renders one session's row in a list of a day's sessions. A month can
+    have hundreds of these, so the row is built here in one go rather than
+    rendered from a template, which would push and pop its context for every
+    session. Only the notes and project name can contain markup, so only they
+    are escaped."""
+
+    return mark_safe(SESSION_ROW.format(
+     id=session.id, start=tz.localtime(session.start).strftime("%H:%M"),
+     end=tz.localtime(session.end).strftime("%H:%M"),
+     notes=NOTES_BUTTON.format(escape(session.notes)) if session.notes else "",
+     project_id=session.project_id, project_name=escape(session.project_name),
+     duration=time_string(session.duration_minutes),
+     breaks="({} minute break)".format(session.breaks) if session.breaks else "-"
+    ))
@@ -0,0 +1,247 @@
+from datetime import datetime, date
+from io import StringIO
+from unittest.mock import Mock, patch
+import pytz
+from testarsenal import DjangoTest
+from mixer.backend.django import mixer
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.conf import settings
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from core.caching import *
+from core.models import User
+from projects.models import Project, Session
+
+class PageCacheTests(DjangoTest):
+
+    def setUp(self):
+        page_cache().clear()
+        self.view = Mock(__name__="view", __module__="tests")
+        self.view.side_effect = lambda r, *a, **k: HttpResponse("PAGE")
+        self.get_scopes = Mock(return_value=["all", "day:2018-01-01"])
+        self.cached = cached_page(self.get_scopes)(self.view)
+        self.request = RequestFactory().get("/day/2018-01-01/")
+        self.request.COOKIES["csrftoken"] = "TOKEN"
+        self.request.user = Mock(id=1, timezone="UTC", project_order="TD")
+        self.request.now = datetime(2018, 1, 2)
+
+
+    def test_pages_are_cached(self):
+        self.assertEqual(self.cached(self.request, day="X").content, b"PAGE")
+        self.assertEqual(self.cached(self.request, day="X").content, b"PAGE")
+        self.assertEqual(self.view.call_count, 1)
+        self.get_scopes.assert_called_with(self.request, day="X")
+        self.assertEqual(stats()["tests.view"], (1, 1))
+
+
+    def test_dummy_page_cache_caches_nothing(self):
+        with self.settings(CACHES=dict(settings.CACHES, pages={
+         "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+        })):
+            self.cached(self.request)
+            self.cached(self.request)
+        self.assertEqual(self.view.call_count, 2)
+        self.assertFalse(self.get_scopes.called)
+
+
+    def test_bumping_scope_invalidates_page(self):
+        self.cached(self.request)
+        bump(2, "day:2018-01-01")
+        self.cached(self.request)
+        self.assertEqual(self.view.call_count, 1)
+        bump(1, "day:2018-01-02")
+        self.cached(self.request)
+        self.assertEqual(self.view.call_count, 1)
+        bump(1, "day:2018-01-01")
+        self.cached(self.request)
+        self.assertEqual(self.view.call_count, 2)
+
+
+    def test_pages_depend_on_user_settings_and_date(self):
+        self.cached(self.request)
+        self.request.user.timezone = "Pacific/Auckland"
+        self.cached(self.request)
+        self.request.now = datetime(2018, 1, 3)
+        self.cached(self.request)
+        self.request.COOKIES["csrftoken"] = "TOKEN2"
+        self.cached(self.request)
+        with timezone.override("Asia/Tokyo"):
+            self.cached(self.request)
+        self.assertEqual(self.view.call_count, 5)
+
+
+    def test_some_requests_are_not_cached(self):
+        self.request.COOKIES = {}
+        self.cached(self.request), self.cached(self.request)
+        self.request.COOKIES["csrftoken"] = "TOKEN"
+        self.request.user.is_authenticated = False
+        self.cached(self.request), self.cached(self.request)
+        self.request.user.is_authenticated = True
+        self.request.method = "POST"
+        self.cached(self.request), self.cached(self.request)
+        self.request.method = "GET"
+        self.get_scopes.return_value = None
+        self.cached(self.request), self.cached(self.request)
+        self.assertEqual(self.view.call_count, 8)
+
+
+    def test_failed_responses_are_not_cached(self):
+        self.view.side_effect = lambda r, *a, **k: HttpResponse(status=302)
+        self.cached(self.request), self.cached(self.request)
+        self.assertEqual(self.view.call_count, 2)
+
+
+    def test_stats_command(self):
+        self.cached(self.request), self.cached(self.request)
+        out = StringIO()
+        call_command("page_cache_stats", stdout=out)
+        self.assertIn("tests.view: 1 hits, 1 misses (50.0% hit rate)", out.getvalue())
+        self.assertIn("projects.views.projects: 0 hits, 0 misses (unused)", out.getvalue())
+
+
+
+class ConditionalPageTests(DjangoTest):
+
+    def setUp(self):
+        self.view = Mock(__name__="view", __module__="tests")
+        self.view.side_effect = lambda r, *a, **k: HttpResponse("PAGE")
+        self.conditional = conditional_page(self.view)
+        self.request = RequestFactory().get("/day/2018-01-01/")
+        self.request.COOKIES["csrftoken"] = "TOKEN"
+        self.request.user = Mock(
+         id=1, timezone="UTC", project_order="TD", email="a@b.c", data_version=3
+        )
+        self.request.now = datetime(2018, 1, 2)
+
+
+    def test_pages_get_private_etags(self):
+        response = self.conditional(self.request)
+        self.assertEqual(response["ETag"], '"{}"'.format(user_etag(self.request)))
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+
+
+    def test_matching_etag_skips_view(self):
+        etag = self.conditional(self.request)["ETag"]
+        self.request.META["HTTP_IF_NONE_MATCH"] = etag
+        response = self.conditional(self.request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.view.call_count, 1)
+
+
+    def test_etag_changes_with_data_and_settings(self):
+        etags = {user_etag(self.request)}
+        self.request.user.data_version = 4
+        etags.add(user_etag(self.request))
+        self.request.user.timezone = "Pacific/Auckland"
+        etags.add(user_etag(self.request))
+        self.request.now = datetime(2018, 1, 3)
+        etags.add(user_etag(self.request))
+        self.request.user.id = 2
+        etags.add(user_etag(self.request))
+        with timezone.override("Asia/Tokyo"):
+            etags.add(user_etag(self.request))
+        self.assertEqual(len(etags), 6)
+
+
+    def test_some_requests_get_no_etag(self):
+        self.request.user.is_authenticated = False
+        self.assertIsNone(user_etag(self.request))
+        self.request.user.is_authenticated = True
+        self.request.COOKIES = {}
+        response = self.conditional(self.request)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Cache-Control"))
+
+
+
+class PageCacheInvalidationTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User, timezone=pytz.timezone("Pacific/Auckland"))
+        self.project = mixer.blend(Project, user=self.user)
+
+
+    @patch("projects.models.caching.bump")
+    def test_session_writes_bump_their_scopes(self, mock_bump):
+        session = Session.objects.create(
+         start=datetime(2008, 1, 31, 12, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, 31, 13, 0, tzinfo=pytz.UTC),
+         project=self.project, timezone=pytz.UTC
+        )
+        mock_bump.assert_called_with(
+         self.user.id, "list", "day:2008-02-01", "month:2008-02",
+         "project:{}".format(self.project.id)
+        )
+        session = Session.objects.get(id=session.id)
+        session.start = datetime(2008, 1, 30, 12, 0, tzinfo=pytz.UTC)
+        session.save()
+        self.assertEqual(set(mock_bump.call_args[0][1:]), {
+         "list", "day:2008-01-31", "month:2008-01", "day:2008-02-01",
+         "month:2008-02", "project:{}".format(self.project.id)
+        })
+        session.delete()
+        mock_bump.assert_called_with(
+         self.user.id, "list", "day:2008-01-31", "month:2008-01",
+         "project:{}".format(self.project.id)
+        )
+
+
+    @patch("projects.models.caching.bump")
+    def test_project_writes_bump_everything(self, mock_bump):
+        self.project.name = "New"
+        self.project.save()
+        mock_bump.assert_called_with(self.user.id, "all")
+        mock_bump.reset_mock()
+        self.project.delete()
+        mock_bump.assert_called_with(self.user.id, "all")
+
+
+    def test_writes_bump_data_version(self):
+        self.user.refresh_from_db()
+        version = self.user.data_version
+        session = Session.objects.create(
+         start=datetime(2008, 1, 31, 12, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, 31, 13, 0, tzinfo=pytz.UTC),
+         project=self.project, timezone=pytz.UTC
+        )
+        session.delete()
+        self.project.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.data_version, version + 3)
+
+
+
+@override_settings(CACHES=dict(settings.CACHES, users={
+ "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "users"
+}))
+class UserCacheTests(DjangoTest):
+
+    def setUp(self):
+        self.user = User.objects.create(username="sam", email="sam@sam.com")
+        cache_user(self.user)
+
+
+    def test_users_can_be_cached_and_forgotten(self):
+        self.assertEqual(cached_user(self.user.id), self.user)
+        forget_user(self.user.id)
+        self.assertIsNone(cached_user(self.user.id))
+
+
+    def test_saving_user_forgets_them(self):
+        self.user.project_order = "LD"
+        self.user.save()
+        self.assertIsNone(cached_user(self.user.id))
+
+
+    def test_deleting_user_forgets_them(self):
+        user_id = self.user.id
+        self.user.delete()
+        self.assertIsNone(cached_user(user_id))
+
+
+    def test_data_changes_forget_user(self):
+        cache_user(self.user)
+        Project.objects.create(name="AAA", user=self.user)
+        self.assertIsNone(cached_user(self.user.id))
@@ -155,6 +155,21 @@ class TimeSettingsFormTests(DjangoTest):
                 timezone.clean(invalid)
 
 
+    @patch("core.forms.DayTotal.objects.rebuild")
+    def test_changing_timezone_rebuilds_day_totals(self, mock_rebuild):
+        user = User.objects.create(username="sam", email="sam@sam.sam")
+        form = TimeSettingsForm(
+         {"timezone": "UTC", "project_order": "LD"}, instance=user
+        )
+        form.is_valid(), form.save()
+        self.assertFalse(mock_rebuild.called)
+        form = TimeSettingsForm(
+         {"timezone": "Pacific/Auckland", "project_order": "LD"}, instance=user
+        )
+        form.is_valid(), form.save()
+        mock_rebuild.assert_called_with(user)
+
+
 
 class AccountSettingsFormTests(DjangoTest):
 
@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from testarsenal import DjangoTest
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.template import engines, TemplateDoesNotExist
+from core import caching
+from core.instrumentation import *
+from core.models import User
+
+class InstrumentationTests(DjangoTest):
+
+    def tearDown(self):
+        stop()
+
+
+    def test_queries_are_counted_and_timed(self):
+        stats = start()
+        with connection.execute_wrapper(time_query):
+            User.objects.count()
+            User.objects.count()
+        self.assertEqual(stats.queries, 2)
+        self.assertGreater(stats.sql_time, 0)
+        self.assertIs(stop(), stats)
+        self.assertIsNone(stop())
+
+
+    def test_url_patterns_are_found(self):
+        self.assertEqual(url_pattern("day/2018-01-01/"), "day/<slug:day>/")
+        self.assertEqual(url_pattern(""), "")
+        self.assertEqual(
+         url_pattern("api/v1/projects/3/"), "api/v1/projects/<int:project>/"
+        )
+        self.assertIsNone(url_pattern("nowhere/"))
+
+
+    def test_templates_are_timed(self):
+        backend = TimedDjangoTemplates({
+         "NAME": "timed", "DIRS": [], "APP_DIRS": True, "OPTIONS": {}
+        })
+        stats = start()
+        template = backend.from_string("{{ x }}!")
+        self.assertEqual(template.render({"x": 1}), "1!")
+        self.assertGreater(stats.template_time, 0)
+        self.assertEqual(backend.get_template("404.html").__class__, TimedTemplate)
+        with self.assertRaises(TemplateDoesNotExist):
+            backend.get_template("nothing.html")
+
+
+
+class RequestTimingsCommandTests(DjangoTest):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            for total in range(1, 101):
+                f.write("2018-01-01 " + json.dumps({
+                 "route": "day/<slug:day>/", "total_ms": total,
+                 "queries": 3 if total < 90 else 5, "sql_ms": 1.0
+                }) + "\n")
+            f.write("Some other message\n")
+            f.write(json.dumps({
+             "route": None, "total_ms": 2, "queries": 0, "sql_ms": 0
+            }) + "\n")
+        self.addCleanup(os.remove, self.path)
+
+
+    def test_report_gives_percentiles_per_route(self):
+        out = StringIO()
+        call_command("request_timings", self.path, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("Route"))
+        self.assertEqual(lines[1].split(), [
+         "day/<slug:day>/", "100", "50.0", "95.0", "99.0", "3.2", "5", "1.0"
+        ])
+        self.assertEqual(lines[2].split()[:2], ["(unmatched)", "1"])
+
+
+    def test_report_handles_missing_and_empty_logs(self):
+        with self.assertRaises(CommandError):
+            call_command("request_timings", self.path + "x", stdout=StringIO())
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command("request_timings", path, stdout=out)
+        self.assertEqual(out.getvalue(), "No requests found\n")
+
+
+
+class BenchmarkViewsCommandTests(DjangoTest):
+
+    def setUp(self):
+        call_command(
+         "generate_load_data", users=2, projects=3, sessions=30, stdout=StringIO()
+        )
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+
+    def test_benchmark_writes_figures_per_view(self):
+        caching.page_cache().clear()
+        out = StringIO()
+        call_command("benchmark_views", repeat=2, output=self.path, stdout=out)
+        self.assertEqual(set(caching.stats().values()), {(0, 0)})
+        with open(self.path) as f: results = json.load(f)
+        self.assertEqual(results["users"], 2)
+        self.assertEqual(
+         set(results["views"]), {"day", "month", "project", "projects", "profile"}
+        )
+        for figures in results["views"].values():
+            self.assertEqual(figures["requests"], 4)
+            self.assertLessEqual(figures["p50_ms"], figures["p99_ms"])
+            self.assertGreater(figures["queries_mean"], 0)
+        self.assertTrue(out.getvalue().startswith("View"))
+        self.assertEqual(len(out.getvalue().splitlines()), 6)
+
+
+    def test_benchmark_needs_users_with_sessions(self):
+        with self.assertRaises(CommandError):
+            call_command(
+             "benchmark_views", "nobody", output=self.path, stdout=StringIO()
+            )
+
+
+
+class BenchmarkTemplatesCommandTests(DjangoTest):
+
+    def test_benchmark_renders_month(self):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command(
+         "benchmark_templates", days=3, sessions=2, repeat=2, output=path,
+         stdout=out
+        )
+        self.assertTrue(out.getvalue().startswith("3 days of 2 sessions"))
+        with open(path) as f: results = json.load(f)
+        self.assertEqual(results["renders"], 2)
+        self.assertGreater(results["bytes"], 0)
+        self.assertLessEqual(results["p50_ms"], results["p95_ms"])
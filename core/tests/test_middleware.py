@@ -1,13 +1,185 @@
+import gzip
+import json
+import pytz
+import tempfile
 from testarsenal import DjangoTest
 from unittest.mock import Mock, patch
+from django.http import HttpResponse
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory
+from django.utils import timezone
+from core.caching import cache_user, cached_user
 from core.middleware import *
+from core.models import User
+
+class CachedAuthenticationMiddlewareTests(DjangoTest):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = self.settings(CACHES=dict(settings.CACHES, users={
+         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+         "LOCATION": directory.name
+        }))
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.user = User.objects.create(username="sam", email="sam@sam.com")
+        self.user.set_password("password")
+        self.user.save()
+        self.request = RequestFactory().get("/")
+        self.request.session = SessionStore()
+        self.request.session.update({
+         SESSION_KEY: str(self.user.id),
+         BACKEND_SESSION_KEY: "django.contrib.auth.backends.ModelBackend",
+         HASH_SESSION_KEY: self.user.get_session_auth_hash()
+        })
+        CachedAuthenticationMiddleware().process_request(self.request)
+
+
+    def test_user_is_loaded_and_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.request.user.id, self.user.id)
+        self.assertEqual(cached_user(self.user.id), self.user)
+
+
+    def test_cached_user_needs_no_queries(self):
+        cache_user(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request.user.username, "sam")
+            self.assertTrue(self.request.user.is_authenticated)
+
+
+    def test_changed_password_logs_out(self):
+        self.user.set_password("new")
+        cache_user(self.user)
+        self.assertFalse(self.request.user.is_authenticated)
+        self.assertNotIn(SESSION_KEY, self.request.session)
+
+
+    def test_anonymous_requests_need_no_queries(self):
+        self.request.session = SessionStore()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.request.user.is_authenticated)
+
+
+    def test_cache_must_be_shared(self):
+        for backend in ("locmem.LocMemCache", "dummy.DummyCache"):
+            with self.settings(CACHES=dict(settings.CACHES, users={
+             "BACKEND": "django.core.cache.backends." + backend
+            })):
+                with self.assertRaises(ImproperlyConfigured):
+                    CachedAuthenticationMiddleware()
+
+
 
 class TimezoneMiddlewareTests(DjangoTest):
 
+    def setUp(self):
+        self.user = User.objects.create(
+         username="sam", email="sam@sam.com", timezone="Pacific/Auckland"
+        )
+        self.request = RequestFactory().get("/")
+        self.request.session = {}
+        self.request.user = self.user
+        self.middleware = TimezoneMiddleware()
+
+
+    def tearDown(self):
+        timezone.deactivate()
+
+
     @patch("core.middleware.timezone")
     def test_can_add_timezome_info_to_requests(self, mock_tz):
-        request = Mock()
-        middleware = TimezoneMiddleware()
-        middleware.process_request(request)
-        mock_tz.activate.assert_called_with(request.user.timezone)
-        self.assertEqual(request.now, mock_tz.localtime())
+        self.request.session = {SESSION_KEY: "1", "timezone": "Europe/Paris"}
+        self.middleware.process_request(self.request)
+        mock_tz.activate.assert_called_with(pytz.timezone("Europe/Paris"))
+        self.assertEqual(self.request.now, mock_tz.localtime())
+
+
+    def test_timezone_is_read_from_session_without_loading_user(self):
+        self.request.session = {SESSION_KEY: "1", "timezone": "Europe/Paris"}
+        self.request.user = Mock()
+        with self.assertNumQueries(0):
+            self.middleware.process_request(self.request)
+        self.assertEqual(timezone.get_current_timezone_name(), "Europe/Paris")
+        self.assertFalse(self.request.user.is_authenticated.called)
+
+
+    def test_timezone_is_stored_in_session_if_missing(self):
+        self.request.session = {SESSION_KEY: "1"}
+        self.middleware.process_request(self.request)
+        self.assertEqual(self.request.session["timezone"], "Pacific/Auckland")
+        self.assertEqual(self.request.now.tzinfo.zone, "Pacific/Auckland")
+
+
+    def test_anonymous_requests_use_default_timezone(self):
+        timezone.activate(pytz.timezone("Europe/Paris"))
+        self.request.user = Mock()
+        self.middleware.process_request(self.request)
+        self.assertEqual(timezone.get_current_timezone_name(), "UTC")
+        self.assertEqual(self.request.session, {})
+
+
+    def test_stale_session_timezone_is_updated_from_loaded_user(self):
+        self.request.session = {SESSION_KEY: "1", "timezone": "Europe/Paris"}
+        self.request._cached_user = self.user
+        response = HttpResponse()
+        self.assertIs(
+         self.middleware.process_response(self.request, response), response
+        )
+        self.assertEqual(self.request.session["timezone"], "Pacific/Auckland")
+
+
+    def test_timezones_are_only_looked_up_once(self):
+        self.assertIs(get_timezone("Asia/Tokyo"), get_timezone("Asia/Tokyo"))
+
+
+
+class InstrumentationMiddlewareTests(DjangoTest):
+
+    def setUp(self):
+        def view(request):
+            list(User.objects.all())
+            list(User.objects.all())
+            return HttpResponse("OK")
+        self.middleware = InstrumentationMiddleware(view)
+        self.request = RequestFactory().get("/time/2018-01/")
+
+
+    def test_timings_are_sent_in_header(self):
+        response = self.middleware(self.request)
+        self.assertEqual(response.content, b"OK")
+        parts = response["Server-Timing"].split(", ")
+        self.assertTrue(parts[0].startswith("sql;dur="))
+        self.assertTrue(parts[0].endswith(';desc="2 queries"'))
+        self.assertTrue(parts[1].startswith("tpl;dur="))
+        self.assertTrue(parts[2].startswith("total;dur="))
+
+
+    def test_timings_are_logged(self):
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            self.middleware(self.request)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["route"], "time/<slug:month>/")
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], 2)
+        self.assertGreaterEqual(record["total_ms"], record["sql_ms"])
+
+
+    def test_queries_outside_requests_are_not_counted(self):
+        self.middleware(self.request)
+        list(User.objects.all())
+        self.assertIsNone(instrumentation.stop())
+
+
+
+class CompressionTests(DjangoTest):
+
+    def test_pages_are_gzipped(self):
+        response = self.client.get("/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"<html", gzip.decompress(response.content))
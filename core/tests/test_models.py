@@ -1,4 +1,4 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import pytz
 from testarsenal import DjangoTest
 from unittest.mock import Mock, patch
@@ -60,9 +60,17 @@ class UserTests(DjangoTest):
         self.assertEqual(user.project_count(), 4)
 
 
-    @patch("projects.models.Session.objects.filter")
-    def test_user_total_time(self, mock_filter):
-        mock_filter.return_value = [Mock(duration=lambda: 50) for _ in range(5)]
+    def test_user_total_time(self):
         user = User.objects.create(username="sam", email="sam@sam.sam")
-        self.assertEqual(user.total_time(), 250)
-        mock_filter.assert_called_with(project__user=user)
+        self.assertEqual(user.total_time(), 0)
+        for minutes in (50, 100):
+            project = mixer.blend(Project, user=user)
+            Session.objects.create(
+             start=datetime(2008, 1, 1, 9, 0, tzinfo=pytz.UTC),
+             end=datetime(2008, 1, 1, 9, 0, tzinfo=pytz.UTC) + timedelta(
+              minutes=minutes
+             ), project=project, timezone=AUCK
+            )
+        mixer.blend(Session, breaks=0)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.total_time(), 150)
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import json
+from unittest.mock import Mock
+import pytz
+from testarsenal import DjangoTest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from core.caching import page_cache
+from core.middleware import remember_timezone
+from core.models import User
+from projects.models import Project, Session
+
+SESSION = {
+ "start_0": "2019-03-04", "start_1": "09:00", "end_0": "2019-03-04",
+ "end_1": "10:30", "breaks": "5", "project": "Project 3", "notes": "Notes"
+}
+
+BUDGETS = {
+ "login/": [("get", "/login/", None, 1)],
+ "policy/": [("get", "/policy/", None, 1)],
+ "": [("get", "/", None, 3)],
+ "logout/": [("post", "/logout/", None, 4)],
+ "profile/<slug:page>/": [
+  ("get", "/profile/time/", None, 2), ("get", "/profile/account/", None, 2)
+ ],
+ "profile/": [("get", "/profile/", None, 4)],
+ "delete-account/": [("get", "/delete-account/", None, 2)],
+ "day/<slug:day>/": [
+  ("get", "/day/2017-06-01/", None, 3),
+  ("post", "/day/2019-03-04/", SESSION, 11)
+ ]
+}
+
+class QueryBudgetTest(DjangoTest):
+    """Every URL is requested by a user with a realistic amount of data - many
+    projects and thousands of sessions over a couple of years - and must make
+    no more SQL queries than its budget, so that a page which starts making a
+    query per row fails here rather than in production. Each client request
+    includes the query that looks up the login session, and most include the
+    one that loads the user.
+
+    The budgets of the projects app's URLs are with its own tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+         username="sam", email="sam@sam.com",
+         timezone=pytz.timezone("Europe/London")
+        )
+        cls.user.set_password("password")
+        cls.user.save()
+        Project.objects.bulk_create([
+         Project(name="Project {}".format(n), user=cls.user) for n in range(60)
+        ])
+        projects = list(Project.objects.filter(user=cls.user).order_by("id"))
+        start = datetime(2017, 1, 1, 9, tzinfo=pytz.UTC)
+        Session.objects.bulk_create([Session(
+         start=start + timedelta(hours=n * 7),
+         end=start + timedelta(hours=n * 7, minutes=45), breaks=n % 10,
+         project=projects[n % 60], user=cls.user, timezone=cls.user.timezone,
+         notes="Note {}".format(n)
+        ) for n in range(3000)])
+        cls.ids = {
+         "project": projects[0].id,
+         "session": Session.objects.filter(
+          project=projects[1]
+         ).order_by("id").first().id
+        }
+
+
+    def setUp(self):
+        page_cache().clear()
+        self.client.force_login(self.user)
+        session = self.client.session
+        remember_timezone(Mock(session=session), self.user)
+        session.save()
+
+
+    def assertQueryBudget(self, method, path, data, budget):
+        """Makes a request and fails, listing the SQL it ran, if it made more
+        queries than the budget allows."""
+
+        path = path.format(**self.ids)
+        with CaptureQueriesContext(connection) as queries:
+            if path.startswith("/api/") and method != "get":
+                response = getattr(self.client, method)(
+                 path, json.dumps(data), content_type="application/json"
+                )
+            else:
+                response = getattr(self.client, method)(path, data or {})
+            if response.streaming: b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, path)
+        if len(queries) > budget:
+            self.fail("{} {} made {} queries, over its budget of {}:\n{}".format(
+             method.upper(), path, len(queries), budget, "\n".join(
+              "{}. {}".format(index, query["sql"]) for index, query
+              in enumerate(queries.captured_queries, start=1)
+             )
+            ))
+
+
+    def assertWithinBudgets(self, budgets):
+        """Makes every request of a dict of URL patterns to requests, each
+        from a fresh start, and checks each is within its budget."""
+
+        for pattern, requests in budgets.items():
+            for request in requests:
+                with self.subTest(pattern=pattern, request=request[:2]):
+                    self.setUp()
+                    self.assertQueryBudget(*request)
+
+
+
+class CoreQueryBudgetTests(QueryBudgetTest):
+
+    def test_every_url_has_a_budget(self):
+        from projects.tests.test_query_budgets import BUDGETS as PROJECT_BUDGETS
+        patterns = [str(p.pattern) for p in get_resolver().url_patterns]
+        self.assertEqual(set(patterns), set(BUDGETS) | set(PROJECT_BUDGETS))
+        self.assertFalse(set(BUDGETS) & set(PROJECT_BUDGETS))
+
+
+    def test_urls_are_within_budget(self):
+        self.assertWithinBudgets(BUDGETS)
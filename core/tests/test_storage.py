@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+from testarsenal import DjangoTest
+from django.core.management import call_command
+from django.test import override_settings
+from core.storage import *
+
+class CompressedVersionsTests(DjangoTest):
+
+    def test_content_is_gzipped_reproducibly(self):
+        content = b"body { color: red; }\n" * 100
+        versions = compressed_versions(content)
+        self.assertEqual(gzip.decompress(versions[".gz"]), content)
+        self.assertEqual(compressed_versions(content)[".gz"], versions[".gz"])
+
+
+    @skipUnless(brotli, "Brotli is not installed")
+    def test_content_is_brotli_compressed(self):
+        content = b"body { color: red; }\n" * 100
+        self.assertEqual(
+         brotli.decompress(compressed_versions(content)[".br"]), content
+        )
+
+
+    def test_incompressible_content_is_left_out(self):
+        self.assertEqual(compressed_versions(os.urandom(64)), {})
+
+
+
+class CompressedManifestStorageTests(DjangoTest):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        os.mkdir(os.path.join(self.source, "css"))
+        with open(os.path.join(self.source, "css", "test.css"), "w") as f:
+            f.write('.notes { background: url("../images/notes.png"); }\n' * 20)
+
+
+    def test_collectstatic_hashes_and_compresses_files(self):
+        with override_settings(
+         STATIC_ROOT=self.root, STATICFILES_DIRS=[self.source],
+         STATICFILES_STORAGE="core.storage.CompressedManifestStaticFilesStorage"
+        ):
+            call_command("collectstatic", interactive=False, stdout=StringIO())
+        with open(os.path.join(self.root, "staticfiles.json")) as f:
+            paths = json.load(f)["paths"]
+        hashed = paths["js/main.js"]
+        self.assertNotEqual(hashed, "js/main.js")
+        with open(os.path.join(self.root, hashed), "rb") as f:
+            content = f.read()
+        for name in (hashed, "js/main.js"):
+            with gzip.open(os.path.join(self.root, name + ".gz")) as f:
+                self.assertEqual(f.read(), content)
+        self.assertTrue(paths["css/test.css"].startswith("css/test."))
+        with gzip.open(os.path.join(self.root, paths["css/test.css"] + ".gz")) as f:
+            self.assertIn(paths["images/notes.png"], f.read().decode())
+        self.assertFalse(os.path.exists(
+         os.path.join(self.root, paths["images/notes.png"] + ".gz")
+        ))
@@ -1,5 +1,14 @@
+from datetime import datetime
+import os
+from time import perf_counter
+from unittest import skipUnless
+from unittest.mock import patch
+import pytz
 from testarsenal import DjangoTest
+from django.template import engines
+from django.utils import timezone as tz
 from core.templatetags import *
+from projects.models import Session
 
 class TimeStringTests(DjangoTest):
 
@@ -15,3 +24,101 @@ class TimeStringTests(DjangoTest):
         self.assertEqual(time_string(90), "1 hour, 30 minutes")
         self.assertEqual(time_string(120), "2 hours")
         self.assertEqual(time_string(130), "2 hours, 10 minutes")
+
+
+    def test_can_convert_zero_and_negative_minutes(self):
+        self.assertEqual(time_string(0), "0 minutes")
+        self.assertEqual(time_string(-1), "-1 minute")
+        self.assertEqual(time_string(-90), "-1 hour, 30 minutes")
+
+
+    def test_can_give_compact_style(self):
+        self.assertEqual(time_string(0, "compact"), "0m")
+        self.assertEqual(time_string(45, "compact"), "45m")
+        self.assertEqual(time_string(60, "compact"), "1h")
+        self.assertEqual(time_string(90, "compact"), "1h 30m")
+        self.assertEqual(time_string(-90, "compact"), "-1h 30m")
+
+
+    def test_can_use_style_in_templates(self):
+        template = engines["django"].from_string(
+         "{{ a|time_string }} / {{ a|time_string:'compact' }}"
+        )
+        self.assertEqual(template.render({"a": 150}), "2 hours, 30 minutes / 2h 30m")
+
+
+    def test_answers_are_remembered(self):
+        time_string.cache_clear()
+        time_string(75)
+        time_string(75)
+        self.assertEqual(time_string.cache_info().hits, 1)
+
+
+
+@skipUnless(os.environ.get("BENCHMARK"), "Set BENCHMARK=1 to run benchmarks")
+class TimeStringBenchmarkTests(DjangoTest):
+
+    def test_remembered_answers_are_cheaper(self):
+        minutes = [(n * 5) % 600 for n in range(10000)]
+        timings = {}
+        for name, function in (
+         ("before", time_string.__wrapped__), ("after", time_string)
+        ):
+            with patch.dict(register.filters, {"time_string": function}):
+                template = engines["django"].from_string(
+                 "{% for m in minutes %}{{ m|time_string }}{% endfor %}"
+                )
+            template.render({"minutes": minutes})
+            began = perf_counter()
+            for _ in range(5): [function(m) for m in minutes]
+            timings[name] = (perf_counter() - began) / 5 * 1000
+            began = perf_counter()
+            for _ in range(5): template.render({"minutes": minutes})
+            timings[name + "_render"] = (perf_counter() - began) / 5 * 1000
+        print(
+         "\ntime_string over 10,000 values: {before:.1f} ms before, {after:.1f} "
+         "ms after\nRendering them: {before_render:.1f} ms before, "
+         "{after_render:.1f} ms after".format(**timings)
+        )
+        self.assertLess(timings["after"], timings["before"])
+
+
+
+class SessionRowTests(DjangoTest):
+
+    def setUp(self):
+        self.session = Session(
+         id=4, start=datetime(2019, 1, 2, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2019, 1, 2, 10, 30, tzinfo=pytz.UTC), breaks=0, notes="",
+         project_id=7, duration_minutes=90
+        )
+        self.session.project_name = "Project"
+
+
+    def test_session_row_has_session_details(self):
+        with tz.override(pytz.timezone("Europe/Paris")):
+            html = session_row(self.session)
+        self.assertIn('data-id="4"', html)
+        self.assertIn('href="/sessions/4/edit/"', html)
+        self.assertIn("10:00 - 11:30", html)
+        self.assertIn('href="/projects/7/">Project</a>', html)
+        self.assertIn("1 hour, 30 minutes", html)
+        self.assertIn('<div class="cell breaks-cell">-</div>', html)
+        self.assertIn('<div class="cell notes-cell"></div>', html)
+
+
+    def test_session_row_shows_breaks_and_notes(self):
+        self.session.breaks, self.session.notes = 10, "Read"
+        html = session_row(self.session)
+        self.assertIn("(10 minute break)", html)
+        self.assertIn('data-notes="Read"', html)
+
+
+    def test_session_row_escapes_text(self):
+        self.session.notes = '"><script>'
+        self.session.project_name = "<b>Project</b>"
+        html = session_row(self.session)
+        self.assertNotIn("<script>", html)
+        self.assertNotIn("<b>", html)
+        self.assertIn('data-notes="&quot;&gt;&lt;script&gt;"', html)
+        self.assertIn("&lt;b&gt;Project&lt;/b&gt;", html)
@@ -1,6 +1,7 @@
 from testarsenal import DjangoTest
 import core.views as core_views
 import projects.views as project_views
+import projects.api as api
 
 class CoreUrlTests(DjangoTest):
 
@@ -43,6 +44,10 @@ class CoreUrlTests(DjangoTest):
 
 class TimeUrlTests(DjangoTest):
 
+    def test_year_url(self):
+        self.check_url_returns_view("/time/1990/", project_views.year)
+
+
     def test_month_url(self):
         self.check_url_returns_view("/time/1990-09/", project_views.month)
 
@@ -55,6 +60,10 @@ class TimeUrlTests(DjangoTest):
         self.check_url_returns_view("/projects/", project_views.projects)
 
 
+    def test_export_url(self):
+        self.check_url_returns_view("/export/", project_views.export)
+
+
     def test_edit_session_url(self):
         self.check_url_returns_view("/sessions/199/edit/", project_views.edit_session)
 
@@ -73,3 +82,22 @@ class TimeUrlTests(DjangoTest):
 
     def test_delete_project_url(self):
         self.check_url_returns_view("/projects/199/delete/", project_views.delete_project)
+
+
+
+class ApiUrlTests(DjangoTest):
+
+    def test_sessions_api_url(self):
+        self.check_url_returns_view("/api/v1/sessions/", api.sessions)
+
+
+    def test_projects_api_url(self):
+        self.check_url_returns_view("/api/v1/projects/", api.projects)
+
+
+    def test_project_suggestions_api_url(self):
+        self.check_url_returns_view("/api/v1/projects/suggest/", api.suggest_projects)
+
+
+    def test_project_api_url(self):
+        self.check_url_returns_view("/api/v1/projects/199/", api.project)
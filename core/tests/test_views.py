@@ -175,8 +175,9 @@ class DayViewTests(DjangoTest):
 
 
     def test_404_on_invalid_date(self):
-        with self.assertRaises(Http404):
-            day(self.get, day="-098")
+        for value in ("-098", "0001-01-01", "9999-12-31"):
+            with self.assertRaises(Http404):
+                day(self.get, day=value)
 
 
     def test_day_view_sends_form(self):
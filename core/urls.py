@@ -1,6 +1,7 @@
 from django.urls import path, include
 import core.views as core_views
 import projects.views as project_views
+import projects.api as api
 
 urlpatterns = [
  path(r"login/", core_views.login),
@@ -13,6 +14,7 @@ urlpatterns = [
  path(r"delete-account/", core_views.delete_account),
  path(r"day/<slug:day>/", core_views.day),
 ] + [
+ path(r"time/<int:year>/", project_views.year),
  path(r"time/<slug:month>/", project_views.month),
  path(r"projects/new/", project_views.new_project),
  path(r"projects/<slug:project>/", project_views.project),
@@ -21,4 +23,10 @@ urlpatterns = [
  path(r"sessions/<slug:session>/edit/", project_views.edit_session),
  path(r"sessions/<slug:session>/delete/", project_views.delete_session),
  path(r"projects/", project_views.projects),
+ path(r"export/", project_views.export),
+] + [
+ path(r"api/v1/sessions/", api.sessions),
+ path(r"api/v1/projects/", api.projects),
+ path(r"api/v1/projects/suggest/", api.suggest_projects),
+ path(r"api/v1/projects/<int:project>/", api.project),
 ]
@@ -7,6 +7,8 @@ from django.http import Http404
 from core.forms import *
 from projects.forms import SessionForm, ProjectForm, process_session_form_data
 from projects.models import Session, Project
+from core.caching import cached_page, conditional_page
+from core.middleware import remember_timezone
 
 def root(request):
     """The view that handles requests to the root URL. It hands the request to
@@ -42,6 +44,7 @@ def login(request):
         user = form.validate_credentials()
         if user:
             auth.login(request, user)
+            remember_timezone(request, user)
             return redirect("/")
     return render(request, "login.html", {"form": form})
 
@@ -52,13 +55,27 @@ def policy(request):
     return render(request, "policy.html")
 
 
+def day_scopes(request, day=None, home=False):
+    """The cache scopes a day page depends on."""
+
+    try:
+        day = date(*[int(x) for x in day.split("-")]) if day else request.now.date()
+    except: return None
+    return ["all", "day:" + day.isoformat()]
+
+
 @login_required(login_url="/", redirect_field_name=None)
+@conditional_page
+@cached_page(day_scopes)
 def day(request, day=None, home=False):
-    """The view that responds to requests for a given day."""
+    """The view that responds to requests for a given day. The first and last
+    days that can be represented don't exist, as their bounds can't be worked
+    out in every timezone."""
 
     try:
         day = date(*[int(x) for x in day.split("-")]) if day else request.now.date()
     except: raise Http404
+    if not date.min < day < date.max: raise Http404
     form = SessionForm(date=day)
     if request.method == "POST":
         form = process_session_form_data(request, date=day)
@@ -79,6 +96,7 @@ def logout(request):
 
 
 @login_required(login_url="/", redirect_field_name=None)
+@conditional_page
 def profile(request, page="profile"):
     """The view dealing with the user's profile."""
 
@@ -90,6 +108,8 @@ def profile(request, page="profile"):
             context["form"] = Form(request.POST, instance=request.user)
             if context["form"].is_valid():
                 context["form"].save()
+                if page == "time":
+                    remember_timezone(request, context["form"].instance)
                 if page == "account":
                     update_session_auth_hash(request, context["form"].instance)
                 return redirect(f"/profile/{page}/")
@@ -0,0 +1,342 @@
+"""A versioned JSON API for reading and writing sessions and projects, for use
+by integrations. It uses the same login session as the rest of the site, and
+the same forms to validate what it is sent. Writes of several sessions happen
+in one transaction, so either all of them are saved or none are."""
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import wraps
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone as tz
+from projects.forms import SessionForm, ProjectForm, ProjectResolver
+from projects.models import Session, Project, local_day_bounds
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SUGGESTION_LIMIT = 10
+SUGGESTION_CACHE_SIZE = 2000
+suggestion_cache, suggestion_lock = OrderedDict(), threading.Lock()
+SESSION_FIELDS = ("id", "project", "start", "end", "breaks", "timezone", "notes")
+
+def api_view(*methods):
+    """A decorator for API views. It rejects anonymous users and other HTTP
+    methods, decodes the JSON body of anything other than a GET, which is
+    passed to the view as ``data``, and turns a ``(status, dict)`` returned by
+    the view into a JSON response."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({"error": "Not logged in"}, status=401)
+            if request.method not in methods:
+                return JsonResponse({"error": "Method not allowed"}, status=405)
+            data = None
+            if request.method != "GET":
+                try:
+                    data = json.loads(request.body.decode() or "{}")
+                except ValueError:
+                    return JsonResponse({"error": "Invalid JSON"}, status=400)
+                if not isinstance(data, dict):
+                    return JsonResponse({"error": "Invalid JSON"}, status=400)
+            status, content = view(request, *args, data=data, **kwargs)
+            return JsonResponse(content, status=status)
+        return wrapper
+    return decorator
+
+
+def error_json(form):
+    """Turns a form's errors into a dict of field names to lists of
+    messages."""
+
+    return {field: list(errors) for field, errors in form.errors.items()}
+
+
+def session_json(session):
+    """Turns a dict of a session's values, with its duration in ``minutes``,
+    into the compact form the API sends. Times are given in the user's
+    timezone, with their offset."""
+
+    return {
+     "id": session["id"], "project": session["project"],
+     "start": tz.localtime(session["start"]).isoformat(),
+     "end": tz.localtime(session["end"]).isoformat(),
+     "breaks": session["breaks"], "minutes": session["minutes"],
+     "timezone": str(session["timezone"]), "notes": session["notes"]
+    }
+
+
+def project_json(project):
+    """Turns a project into the compact form the API sends, including its
+    stored session totals."""
+
+    return {
+     "id": project.id, "name": project.name, "minutes": project.total_minutes,
+     "sessions": project.session_count,
+     "first_start": project.first_start and tz.localtime(
+      project.first_start
+     ).isoformat(),
+     "last_end": project.last_end and tz.localtime(project.last_end).isoformat()
+    }
+
+
+def session_form_data(values, project_names):
+    """Takes the JSON values of a session and turns them into the POST data a
+    ``SessionForm`` expects. Times are local to the user, and can be written
+    as ``2018-05-04 09:30`` or ``2018-05-04T09:30``. The project can be given
+    by name or by ID, which is looked up in the dict of the user's project
+    names."""
+
+    project = values.get("project")
+    data = {
+     "breaks": str(values.get("breaks") or 0), "notes": values.get("notes", ""),
+     "project": project_names.get(project) if isinstance(project, int) else project
+    }
+    for field in ("start", "end"):
+        value = values.get(field)
+        if isinstance(value, datetime):
+            value = tz.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+        parts = str(value or "").replace("T", " ").split(" ", 1) + [""]
+        data[field + "_0"], data[field + "_1"] = parts[:2]
+    return data
+
+
+def validate_sessions(user, items, instances=None):
+    """Checks a list of sessions' JSON values against ``SessionForm``, and
+    returns the forms along with a dict of errors keyed by each invalid
+    session's position in the list. If existing sessions are being updated,
+    their values are used for anything that isn't sent. The forms share one
+    project resolver, so each project is only looked up once.
+
+    SQL queries: 1, plus one per project and one per valid session"""
+
+    project_names = dict(
+     Project.objects.filter(user=user).values_list("id", "name")
+    )
+    projects = ProjectResolver(user)
+    forms, errors = [], {}
+    for index, values in enumerate(items):
+        instance = instances[index] if instances else None
+        if not isinstance(values, dict):
+            errors[str(index)] = {"__all__": ["Sessions must be objects"]}
+            continue
+        if instance:
+            values = dict({
+             "start": instance.start, "end": instance.end,
+             "breaks": instance.breaks, "notes": instance.notes,
+             "project": instance.project_id
+            }, **values)
+        form = SessionForm(
+         session_form_data(values, project_names), user=user,
+         instance=instance, projects=projects
+        )
+        if form.is_valid():
+            forms.append(form)
+        else:
+            errors[str(index)] = error_json(form)
+    return forms, errors
+
+
+def sessions_with_duration(user):
+    """The user's sessions as dicts of the values the API sends, with the
+    durations worked out by the database."""
+
+    return Session.objects.filter(user=user).with_duration().values(
+     *SESSION_FIELDS, "minutes"
+    )
+
+
+@api_view("GET", "POST", "PATCH", "DELETE")
+def sessions(request, data=None):
+    """Lists, creates, updates or deletes the user's sessions, depending on the
+    method.
+
+    A GET lists sessions newest first, a page at a time. They can be narrowed
+    down with a ``project`` ID and an inclusive range of local ``start`` and
+    ``end`` dates. The page size is set with ``limit``, and the next page is got
+    by sending the ``before`` cursor that came with the last one.
+
+    A POST sends ``{"sessions": [...]}`` to create sessions, a PATCH sends the
+    same list with an ``id`` in each to change some of their values, and a
+    DELETE sends ``{"ids": [...]}``."""
+
+    if request.method == "GET": return list_sessions(request)
+    if request.method == "DELETE":
+        ids = data.get("ids")
+        if not isinstance(ids, list) or not all(isinstance(id, int) for id in ids):
+            return 400, {"error": "A list of session IDs is required"}
+        deleted = Session.objects.filter(user=request.user, id__in=ids).delete()
+        return 200, {"deleted": deleted[1].get("projects.Session", 0)}
+    items = data.get("sessions")
+    if not isinstance(items, list):
+        return 400, {"error": "A list of sessions is required"}
+    if request.method == "POST": return create_sessions(request, items)
+    return update_sessions(request, items)
+
+
+def list_sessions(request):
+    """Sends one page of the user's sessions.
+
+    SQL queries: 1"""
+
+    sessions = sessions_with_duration(request.user)
+    try:
+        limit = min(int(request.GET.get("limit", PAGE_SIZE)), MAX_PAGE_SIZE)
+        if limit < 1: raise ValueError
+        if request.GET.get("project"):
+            sessions = sessions.filter(project=int(request.GET["project"]))
+        if request.GET.get("start"):
+            sessions = sessions.filter(start__gte=local_day_bounds(
+             date(*map(int, request.GET["start"].split("-"))),
+             request.user.timezone
+            )[0])
+        if request.GET.get("end"):
+            sessions = sessions.filter(start__lt=local_day_bounds(
+             date(*map(int, request.GET["end"].split("-"))),
+             request.user.timezone
+            )[1])
+        if request.GET.get("before"):
+            start, id = Session.parse_cursor(request.GET["before"])
+            sessions = sessions.filter(
+             Q(start__lt=start) | Q(start=start, id__lt=id)
+            )
+    except (ValueError, TypeError, OverflowError):
+        return 400, {"error": "Invalid query"}
+    page = list(sessions.order_by("-start", "-id")[:limit + 1])
+    before = None
+    if len(page) > limit:
+        page = page[:limit]
+        before = Session(start=page[-1]["start"], id=page[-1]["id"]).cursor()
+    return 200, {
+     "sessions": [session_json(session) for session in page], "before": before
+    }
+
+
+def create_sessions(request, items):
+    """Validates and creates a list of sessions. They are inserted together,
+    and their projects' and days' totals are recalculated once. The IDs of the
+    new sessions are sent where the database gives them back.
+
+    SQL queries: 1 + one per session, and then the rebuilding of totals"""
+
+    forms, errors = validate_sessions(request.user, items)
+    if errors: return 400, {"errors": errors}
+    with transaction.atomic():
+        created = Session.objects.bulk_create(
+         [form.save(commit=False) for form in forms]
+        )
+    return 201, {"sessions": [session_json(dict(
+     {field: getattr(s, field) for field in SESSION_FIELDS},
+     project=s.project_id, minutes=s.duration_minutes
+    )) for s in created]}
+
+
+def update_sessions(request, items):
+    """Validates and saves changes to a list of sessions. Each session's own
+    save keeps its project's and day's totals up to date.
+
+    SQL queries: 3 + about seven per session"""
+
+    ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+    existing = Session.objects.filter(user=request.user, id__in=[
+     id for id in ids if isinstance(id, int)
+    ]).in_bulk()
+    missing = {str(index): {"id": ["No such session"]} for index, id in
+     enumerate(ids) if not isinstance(id, int) or id not in existing}
+    if missing: return 400, {"errors": missing}
+    forms, errors = validate_sessions(
+     request.user, items, instances=[existing[id] for id in ids]
+    )
+    if errors: return 400, {"errors": errors}
+    with transaction.atomic():
+        for form in forms: form.save()
+    return 200, {"sessions": [session_json(session) for session in
+     sessions_with_duration(request.user).filter(id__in=ids).order_by(
+      "-start", "-id"
+     )]}
+
+
+@api_view("GET", "POST")
+def projects(request, data=None):
+    """Lists the user's projects in name order, or creates a new one from a
+    ``name``.
+
+    SQL queries: 1"""
+
+    if request.method == "GET":
+        return 200, {"projects": [project_json(project) for project in
+         Project.objects.filter(user=request.user)]}
+    return save_project(request, data, None)
+
+
+def project_suggestions(user, prefix):
+    """Returns the ``(id, name)`` pairs of the user's projects whose names
+    start with the prefix, ignoring case, ranked in the user's project order.
+
+    Answers are kept in a small in-process cache, keyed by the user's data
+    version so that they are never used once a project or session has
+    changed. If a shorter prefix's answer is cached and wasn't cut short, the
+    answer is filtered from that without a query.
+
+    SQL queries: 1, or 0 if answered from the cache"""
+
+    prefix = prefix.lower()
+    key = (user.id, user.data_version, user.project_order)
+    with suggestion_lock:
+        shorter = suggestion_cache.get(key + (prefix[:-1],)) if prefix else None
+        if key + (prefix,) in suggestion_cache:
+            suggestion_cache.move_to_end(key + (prefix,))
+            return suggestion_cache[key + (prefix,)]
+    if shorter is not None and len(shorter) < SUGGESTION_LIMIT:
+        suggestions = [s for s in shorter if s[1].lower().startswith(prefix)]
+    else:
+        suggestions = [(project.id, project.name) for project in
+         Project.by_user_order(user).with_prefix(prefix).only(
+          "id", "name"
+         )[:SUGGESTION_LIMIT]]
+    with suggestion_lock:
+        suggestion_cache[key + (prefix,)] = suggestions
+        while len(suggestion_cache) > SUGGESTION_CACHE_SIZE:
+            suggestion_cache.popitem(last=False)
+    return suggestions
+
+
+@api_view("GET")
+def suggest_projects(request, data=None):
+    """Sends the user's projects whose names start with ``q``, for completing
+    project names as they are typed."""
+
+    return 200, {"projects": [{"id": id, "name": name} for id, name in
+     project_suggestions(request.user, request.GET.get("q", ""))]}
+
+
+@api_view("GET", "PATCH", "DELETE")
+def project(request, project, data=None):
+    """Sends, renames or deletes one of the user's projects."""
+
+    try:
+        project = Project.objects.get(id=project, user=request.user)
+    except Project.DoesNotExist:
+        return 404, {"error": "No such project"}
+    if request.method == "GET": return 200, project_json(project)
+    if request.method == "DELETE":
+        project.delete()
+        return 200, {"deleted": 1}
+    return save_project(request, data, project)
+
+
+def save_project(request, data, project):
+    """Validates a project's JSON values with ``ProjectForm`` and saves it,
+    sending back the saved project or the form's errors."""
+
+    form = ProjectForm(request.user, {"name": data.get("name")}, instance=project)
+    if not form.is_valid(): return 400, {"errors": error_json(form)}
+    try:
+        with transaction.atomic(): form.save()
+    except IntegrityError:
+        return 400, {"errors": {"name": ["There is already a project with this name"]}}
+    return 200 if project else 201, project_json(form.instance)
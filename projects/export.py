@@ -0,0 +1,78 @@
+"""Exporting of a user's sessions as CSV or JSON Lines, one line at a time.
+
+Sessions are read from the database in chunks and turned into lines as they
+go, so the memory used stays the same however many sessions a user has. The
+columns are the ones ``import_sessions`` reads, so an export can be imported
+again elsewhere."""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from django.utils import timezone as tz
+from projects.models import Session, local_day_bounds
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+COLUMNS = ("project", "start", "end", "breaks", "minutes", "timezone", "notes")
+CHUNK_SIZE = 2000
+
+def parse_date(value):
+    """Turns a ``YYYY-MM-DD`` string into a date, raising ``ValueError`` if it
+    isn't one, or if it is the first or last day that can be represented, as
+    the bounds of those days can't be worked out in every timezone."""
+
+    day = datetime.strptime(value, "%Y-%m-%d").date()
+    if not date.min < day < date.max: raise ValueError("Date out of range")
+    return day
+
+
+def sessions_to_export(user, project=None, start=None, end=None):
+    """Gets the user's sessions as dicts of the values to be exported, oldest
+    first, optionally only for one project ID or from an inclusive range of the
+    user's local dates. Durations are worked out by the database."""
+
+    sessions = Session.objects.filter(user=user)
+    if project: sessions = sessions.filter(project=project)
+    if start:
+        sessions = sessions.filter(
+         start__gte=local_day_bounds(start, user.timezone)[0]
+        )
+    if end:
+        sessions = sessions.filter(
+         start__lt=local_day_bounds(end, user.timezone)[1]
+        )
+    return sessions.with_duration().values(
+     "project__name", "start", "end", "breaks", "minutes", "timezone", "notes"
+    ).order_by("start", "id")
+
+
+def export_rows(sessions):
+    """Takes the values of sessions and yields them as export rows, with times
+    given in each session's own timezone."""
+
+    for session in sessions.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+         "project": session["project__name"],
+         "start": tz.localtime(session["start"], session["timezone"]).isoformat(),
+         "end": tz.localtime(session["end"], session["timezone"]).isoformat(),
+         "breaks": session["breaks"], "minutes": session["minutes"],
+         "timezone": str(session["timezone"]), "notes": session["notes"]
+        }
+
+
+def export_lines(sessions, format):
+    """Yields the lines of an export of the sessions in the given format, each
+    as a string ending in a newline. CSV exports start with a header line."""
+
+    if format == "jsonl":
+        for row in export_rows(sessions): yield json.dumps(row) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for row in export_rows(sessions):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -3,6 +3,7 @@ from django import forms
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
 from .models import Session, Project
 
 class ProjectNameWidget(forms.TextInput):
@@ -53,6 +54,69 @@ class ProjectForm(forms.ModelForm):
 
 
 
+class ProjectResolver:
+    """Finds a user's projects for the length of one request, remembering each
+    one it looks up so that everything handling the same submitted data - the
+    session form's project field and widget, and the creation of new projects
+    - shares a single query."""
+
+    def __init__(self, user):
+        self.user = user
+        self.by_name, self.by_id = {}, {}
+
+
+    def get(self, name):
+        """Returns the user's project with the given name, or ``None`` if there
+        isn't one.
+
+        SQL queries: 1, or 0 if the name has been looked up already"""
+
+        name = (name or "").strip()
+        if not name: return None
+        if name not in self.by_name:
+            try:
+                self.by_name[name] = Project.objects.get(user=self.user, name=name)
+            except Project.DoesNotExist:
+                self.by_name[name] = None
+        return self.by_name[name]
+
+
+    def get_by_id(self, id):
+        """Returns the project with the given ID, or ``None`` if there isn't
+        one.
+
+        SQL queries: 1, or 0 if the ID has been looked up already"""
+
+        if id not in self.by_id:
+            try:
+                self.by_id[id] = Project.objects.get(id=id)
+            except Project.DoesNotExist:
+                self.by_id[id] = None
+        return self.by_id[id]
+
+
+    def get_or_create(self, name):
+        """Returns the user's project with the given name, creating it first if
+        there isn't one and the name is valid for a project. If another request
+        creates the same project at the same moment, the unique constraint
+        stops the second insert and the project is looked up again.
+
+        SQL queries: 1, or more if the project is created"""
+
+        project = self.get(name)
+        form = ProjectForm(self.user, {"name": name})
+        if project or not form.is_valid(): return project
+        name = form.cleaned_data["name"]
+        try:
+            with transaction.atomic():
+                project = Project.objects.create(user=self.user, name=name)
+        except IntegrityError:
+            project = Project.objects.get(user=self.user, name=name)
+        self.by_name[name] = project
+        return project
+
+
+
 class DateWidget(forms.DateInput):
     """The widget used to take date inputs."""
 
@@ -142,24 +206,24 @@ class SessionBreaksWidget(forms.NumberInput):
 
 
 class SessionProjectField(forms.ModelChoiceField):
-    """The field used to hold a project."""
+    """The field used to hold a project. Projects are found through the form's
+    project resolver."""
 
     def __init__(self, *args, **kwargs):
         forms.ModelChoiceField.__init__(self, *args, **kwargs)
-        self.user = None
+        self.resolver = None
         self.queryset = Project.objects
 
 
     def to_python(self, value):
         """Controls how the field turns POST data into an object. It will be
         interpreted as a project name. If there is no project, it means that the
-        project form that was applied to the POST data previosly wasn't happy,
-        so an error about an invalid project name will be sent."""
+        project couldn't be created from the POST data previously, so an error
+        about an invalid project name will be sent."""
 
-        try:
-            return Project.objects.get(user=self.user, name=value)
-        except Project.DoesNotExist:
-            raise ValidationError("Invalid project name")
+        project = self.resolver.get(value)
+        if project is None: raise ValidationError("Invalid project name")
+        return project
 
 
 
@@ -168,19 +232,20 @@ class SessionProjectWidget(forms.TextInput):
 
     def __init__(self, *args, **kwargs):
         forms.TextInput.__init__(self, *args, **kwargs)
-        self.user = None
+        self.resolver = None
 
 
     def format_value(self, value):
         """If the field holds a number, it's an ID and that project should be
         rendered. If the field holds a string, it's a name and that project
-        for that user should be rendered (unless it's just spaces)."""
+        for that user should be rendered (unless it's just spaces). Projects
+        already found while handling the request aren't looked up again."""
 
         if value:
             if isinstance(value, int):
-                return Project.objects.get(id=value)
+                return self.resolver.get_by_id(value)
             elif value.strip():
-                return Project.objects.get(user=self.user, name=value)
+                return self.resolver.get(value)
 
 
 
@@ -190,7 +255,9 @@ class SessionForm(forms.ModelForm):
     They can provide a new project at the same time.
 
     A user can be provided so that projects can be looked up, and a date can be
-    provided so that other default dates can be displayed."""
+    provided so that other default dates can be displayed. A project resolver
+    that has already been used on the same data can be passed in, so that
+    projects aren't looked up twice."""
 
     class Meta:
         model = Session
@@ -214,9 +281,10 @@ class SessionForm(forms.ModelForm):
         }
 
 
-    def __init__(self, *args, user=None, date=None, **kwargs):
+    def __init__(self, *args, user=None, date=None, projects=None, **kwargs):
         self.user = user
         self.date = date
+        self.projects = projects or ProjectResolver(user)
         forms.ModelForm.__init__(self, *args, **kwargs)
         self.fields["start"].widget.instance = self.instance.id is not None
         self.fields["end"].widget.instance = self.instance.id is not None
@@ -224,8 +292,8 @@ class SessionForm(forms.ModelForm):
         self.fields["end"].initial = timezone.localtime()
         self.fields["timezone"].widget.user = self.user
         self.fields["breaks"].widget.is_required = False
-        self.fields["project"].user = self.user
-        self.fields["project"].widget.user = self.user
+        self.fields["project"].resolver = self.projects
+        self.fields["project"].widget.resolver = self.projects
         if date:
             self.fields["start"].initial = datetime(date.year, date.month, date.day)
             self.fields["end"].initial = datetime(date.year, date.month, date.day)
@@ -236,22 +304,45 @@ class SessionForm(forms.ModelForm):
 
         forms.ModelForm.clean(self)
         if "start" in self.cleaned_data and "end" in self.cleaned_data:
-            if self.cleaned_data["end"] < self.cleaned_data["start"]:
-                self.add_error("end", "End time is before start time")
-            elif (self.cleaned_data["end"] - self.cleaned_data["start"]
-             ).seconds <= self.cleaned_data.get("breaks", 0) * 60:
-                self.add_error("breaks", "Break cannot cancel out session")
+            error = check_session_times(
+             self.cleaned_data["start"], self.cleaned_data["end"],
+             self.cleaned_data.get("breaks", 0)
+            )
+            if error: self.add_error(*error)
+
+
+    def save(self, *args, **kwargs):
+        """Saves the session, attaching the form's user to it first so that the
+        session doesn't have to look its user up again."""
+
+        if self.user and self.user.id == self.instance.project.user_id:
+            self.instance.user = self.user
+        return forms.ModelForm.save(self, *args, **kwargs)
+
 
 
+def check_session_times(start, end, breaks):
+    """Checks that a session's times and break time mesh well together. If they
+    don't, the name of the field at fault and an error message are returned,
+    otherwise ``None`` is."""
+
+    if end < start:
+        return ("end", "End time is before start time")
+    if (end - start).seconds <= breaks * 60:
+        return ("breaks", "Break cannot cancel out session")
+
 
 def process_session_form_data(request, date=None, instance=None):
-    """Takes a POST request with session form data, passes it through the
-    appropriate forms, and returns the SessionForm."""
+    """Takes a POST request with session form data, finds or creates the
+    project it names, and returns the SessionForm, which shares the project
+    that was found.
+
+    SQL queries: 1 if the project exists"""
 
-    try:
-        ProjectForm(request.user, request.POST).save()
-    except: pass
+    projects = ProjectResolver(request.user)
+    projects.get_or_create(request.POST.get("project"))
     form = SessionForm(
-     request.POST, user=request.user, date=date, instance=instance
+     request.POST, user=request.user, date=date, instance=instance,
+     projects=projects
     )
     return form
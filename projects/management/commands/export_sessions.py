@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import User
+from projects.models import Project
+from projects.export import FORMATS, parse_date, sessions_to_export, export_lines
+
+class Command(BaseCommand):
+    """Writes out a user's sessions as CSV or JSON Lines, in the same format as
+    the export download. Sessions are read a chunk at a time, so it can dump
+    users with any number of sessions."""
+
+    help = "Exports a user's sessions as CSV or JSON Lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="The user whose sessions to export")
+        parser.add_argument(
+         "--format", choices=tuple(FORMATS), default="csv",
+         help="The format to write"
+        )
+        parser.add_argument("--project", help="Only export this project, by name")
+        parser.add_argument("--start", help="The first local date to export")
+        parser.add_argument("--end", help="The last local date to export")
+        parser.add_argument(
+         "--output", help="The file to write to, rather than standard output"
+        )
+
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if not user:
+            raise CommandError("No such user: {}".format(options["username"]))
+        project = None
+        if options["project"]:
+            project = Project.objects.filter(
+             user=user, name=options["project"]
+            ).first()
+            if not project:
+                raise CommandError("No such project: {}".format(options["project"]))
+        try:
+            start, end = [parse_date(options[key]) if options[key] else None
+             for key in ("start", "end")]
+        except ValueError:
+            raise CommandError("Dates must be given as YYYY-MM-DD")
+        lines = export_lines(sessions_to_export(
+         user, project=project, start=start, end=end
+        ), options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                for line in lines: f.write(line)
+        else:
+            for line in lines: self.stdout.write(line, ending="")
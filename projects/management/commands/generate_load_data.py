@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, time, timedelta
+from time import monotonic
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+from core.models import User
+from projects.models import Project, Session
+
+TIMEZONES = (
+ "UTC", "Europe/London", "Europe/Berlin", "America/New_York",
+ "America/Los_Angeles", "Asia/Kolkata", "Asia/Tokyo", "Australia/Sydney"
+)
+WORDS = (
+ "Thesis", "Website", "Garden", "Novel", "Accounts", "Research", "Teaching",
+ "Reading", "Kitchen", "Database", "Podcast", "Translation", "Grant", "Music"
+)
+
+class Command(BaseCommand):
+    """Fills the database with made up users, projects and sessions, for
+    seeing how the site behaves with production amounts of data. Users are
+    spread across timezones, and their sessions across the last few years at
+    plausible local times of day. Everything is inserted in bulk, and the
+    stored project and daily totals are worked out once at the end. The same
+    seed always makes the same data."""
+
+    help = "Generates users, projects and sessions for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+         "--users", type=int, default=10, help="How many users to create"
+        )
+        parser.add_argument(
+         "--projects", type=int, default=20, help="How many projects each user has"
+        )
+        parser.add_argument(
+         "--sessions", type=int, default=2000,
+         help="How many sessions each user has"
+        )
+        parser.add_argument(
+         "--years", type=int, default=3,
+         help="How many years back the sessions go"
+        )
+        parser.add_argument(
+         "--prefix", default="load-",
+         help="What the generated usernames start with"
+        )
+        parser.add_argument(
+         "--seed", type=int, default=0, help="The seed for the random data"
+        )
+        parser.add_argument(
+         "--batch-size", type=int, default=5000,
+         help="How many sessions to insert at a time"
+        )
+
+
+    def handle(self, *args, **options):
+        if min(options[key] for key in (
+         "users", "projects", "years", "batch_size"
+        )) < 1 or options["sessions"] < 0:
+            raise CommandError("The numbers given must be positive")
+        self.random = random.Random(options["seed"])
+        began = monotonic()
+        usernames = ["{}{}".format(options["prefix"], n + 1)
+         for n in range(options["users"])]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError(
+             "Users starting {} already exist".format(options["prefix"])
+            )
+        users = self.create_users(usernames)
+        projects = self.create_projects(users, options["projects"])
+        created = Session.objects.bulk_insert((
+         session for user in users for session in self.make_sessions(
+          user, projects[user.id], options["sessions"], options["years"]
+         )
+        ), options["batch_size"])
+        self.stdout.write(
+         "Created {} users, {} projects and {} sessions in {:.1f}s".format(
+          len(users), sum(len(p) for p in projects.values()), created,
+          monotonic() - began
+         )
+        )
+
+
+    def create_users(self, usernames):
+        """Creates users with the given usernames, in a cycle of timezones and
+        with no usable password, and returns them.
+
+        SQL queries: 2"""
+
+        users = []
+        for index, username in enumerate(usernames):
+            user = User(
+             username=username, email="{}@example.com".format(username),
+             timezone=pytz.timezone(TIMEZONES[index % len(TIMEZONES)]),
+             project_order=("TD", "LD")[index % 2]
+            )
+            user.set_unusable_password()
+            users.append(user)
+        User.objects.bulk_create(users)
+        return list(User.objects.filter(username__in=usernames).order_by("id"))
+
+
+    def create_projects(self, users, count):
+        """Creates projects for each user, and returns a dict of user IDs to
+        lists of their project IDs.
+
+        SQL queries: 2"""
+
+        Project.objects.bulk_create([Project(
+         user=user, name="{} {}".format(WORDS[n % len(WORDS)], n + 1)
+        ) for user in users for n in range(count)])
+        projects = {}
+        for user_id, project_id in Project.objects.filter(
+         user__in=users
+        ).values_list("user", "id").order_by("id"):
+            projects.setdefault(user_id, []).append(project_id)
+        return projects
+
+
+    def make_sessions(self, user, project_ids, count, years):
+        """Yields unsaved sessions for a user, on random days in the last few
+        years and in their own timezone. Some projects are worked on far more
+        than others, as they would be."""
+
+        today = datetime.now(user.timezone).date()
+        days = years * 365
+        weights = [1 / (n + 1) for n in range(len(project_ids))]
+        for project_id in self.random.choices(project_ids, weights, k=count):
+            day = today - timedelta(days=self.random.randrange(days))
+            start = user.timezone.localize(datetime.combine(day, time(
+             self.random.randint(6, 20), self.random.randrange(0, 60, 5)
+            )))
+            minutes = self.random.randrange(15, 300, 5)
+            breaks = self.random.choice((0, 0, 0, 5, 10, 15, 30))
+            yield Session(
+             start=start, end=start + timedelta(minutes=minutes),
+             breaks=breaks if breaks < minutes else 0,
+             timezone=user.timezone, user_id=user.id, project_id=project_id,
+             notes=self.random.choice(("", "", "Planning", "Follow up", "Review"))
+            )
+
@@ -0,0 +1,152 @@
+import csv
+import json
+from time import monotonic
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from core.models import User
+from projects.forms import check_session_times
+from projects.models import Project, Session
+
+class Command(BaseCommand):
+    """Imports sessions from a CSV or JSON Lines file, such as a timesheet
+    exported from another tool. Each row has a ``project`` name, ``start`` and
+    ``end`` times, and optionally ``breaks``, ``notes``, ``timezone`` and
+    ``user`` (a username). Times without an offset are read in the row's
+    timezone, or else the user's.
+
+    The file is streamed rather than read in whole. Projects are looked up by
+    name from a map of each user's projects, and created if they don't exist.
+    Rows are checked with the same rules as the session form, and the valid
+    ones are inserted in batches, each in its own transaction. The stored
+    project and daily totals are recalculated once at the end."""
+
+    help = "Imports sessions from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The file to import")
+        parser.add_argument(
+         "--format", choices=("csv", "jsonl"),
+         help="The file's format, if its extension doesn't say"
+        )
+        parser.add_argument(
+         "--user", help="The username for rows which don't give one"
+        )
+        parser.add_argument(
+         "--batch-size", type=int, default=1000,
+         help="How many sessions to insert at a time"
+        )
+
+
+    def handle(self, *args, **options):
+        format = options["format"] or (
+         "jsonl" if options["path"].endswith((".jsonl", ".json")) else "csv"
+        )
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be positive")
+        self.users, self.projects = {}, {}
+        if options["user"] and not self.get_user(options["user"]):
+            raise CommandError("No such user: {}".format(options["user"]))
+        began, self.rejected = monotonic(), 0
+        try:
+            with open(options["path"], newline="") as f:
+                imported = Session.objects.bulk_insert(self.make_sessions(
+                 self.read_rows(f, format), options["user"]
+                ), options["batch_size"])
+        except OSError as e:
+            raise CommandError(str(e))
+        seconds = monotonic() - began
+        self.stdout.write(
+         "Imported {} session{}, rejected {}, in {:.1f}s ({:.0f} rows/s)".format(
+          imported, "" if imported == 1 else "s", self.rejected, seconds,
+          (imported + self.rejected) / seconds if seconds else 0
+         )
+        )
+
+
+    def read_rows(self, f, format):
+        """Yields the line number and dict of each row in the file, or
+        ``None`` in place of a line of JSON which can't be read."""
+
+        if format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader: yield reader.line_num, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip(): continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError: yield line, None
+
+
+    def make_sessions(self, rows, username):
+        """Yields an unsaved session for each valid row, and counts and reports
+        the rows which aren't valid."""
+
+        for line, row in rows:
+            try:
+                yield self.make_session(row, username)
+            except ValueError as e:
+                self.rejected += 1
+                self.stdout.write("Line {} rejected: {}".format(line, e))
+
+
+    def get_user(self, username):
+        """Gets a user by username, remembering them along with a map of their
+        project names to IDs."""
+
+        if username not in self.users:
+            self.users[username] = User.objects.filter(username=username).first()
+            if self.users[username]:
+                self.projects[self.users[username].id] = dict(
+                 Project.objects.filter(
+                  user=self.users[username]
+                 ).values_list("name", "id")
+                )
+        return self.users[username]
+
+
+    def get_project_id(self, user, name):
+        """Gets the ID of the user's project with the given name, creating the
+        project if it doesn't exist yet."""
+
+        projects = self.projects[user.id]
+        if name not in projects:
+            projects[name] = Project.objects.create(user=user, name=name).id
+        return projects[name]
+
+
+    def make_session(self, row, username):
+        """Turns a row into an unsaved session, raising a ``ValueError`` which
+        says what is wrong if the row isn't valid."""
+
+        if not isinstance(row, dict): raise ValueError("Not a JSON object")
+        user = self.get_user(str(row.get("user") or username or ""))
+        if not user: raise ValueError("No such user")
+        name = str(row.get("project") or "").strip()
+        if not name: raise ValueError("Invalid project name")
+        if len(name) > 255: raise ValueError("Project name is too long")
+        try:
+            timezone = pytz.timezone(str(row.get("timezone") or user.timezone))
+        except pytz.UnknownTimeZoneError:
+            raise ValueError("Unknown timezone")
+        times = []
+        for field in ("start", "end"):
+            try:
+                time = parse_datetime(str(row.get(field) or ""))
+            except ValueError: time = None
+            if not time: raise ValueError("Invalid {} time".format(field))
+            times.append(time if time.tzinfo else timezone.localize(time))
+        try:
+            breaks = int(row.get("breaks") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid breaks")
+        if breaks < 0: raise ValueError("The break must be positive.")
+        error = check_session_times(times[0], times[1], breaks)
+        if error: raise ValueError(error[1])
+        return Session(
+         start=times[0], end=times[1], breaks=breaks, timezone=timezone,
+         notes=str(row.get("notes") or ""), user=user,
+         project_id=self.get_project_id(user, name)
+        )
+
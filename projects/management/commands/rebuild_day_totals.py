@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import User
+from projects.models import DayTotal
+
+class Command(BaseCommand):
+    """Recalculates users' stored daily totals from their sessions, in each
+    user's current timezone. This is needed when a user's timezone changes
+    outside of the time settings page."""
+
+    help = "Rebuilds the stored daily totals of some or all users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+         "usernames", nargs="*", help="Only rebuild these users' totals"
+        )
+
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+            missing = set(options["usernames"]) - set(
+             users.values_list("username", flat=True)
+            )
+            if missing:
+                raise CommandError("No such user: {}".format(
+                 ", ".join(sorted(missing))
+                ))
+        count = 0
+        for user in users.iterator():
+            DayTotal.objects.rebuild(user)
+            count += 1
+        self.stdout.write("Rebuilt daily totals for {} user{}".format(
+         count, "" if count == 1 else "s"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from projects.models import Project
+
+class Command(BaseCommand):
+    """Recalculates every project's stored session totals from its sessions,
+    reporting any project whose stored values had drifted from the truth."""
+
+    help = "Rebuilds the stored session totals of every project"
+
+    STATS = ("total_minutes", "session_count", "first_start", "last_end")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+         "--dry-run", action="store_true",
+         help="Report drift without fixing it"
+        )
+
+
+    def handle(self, *args, **options):
+        drifted = []
+        projects = Project.objects.with_session_stats().order_by("id")
+        for project in projects.iterator():
+            changes = [(name, getattr(project, name), getattr(
+             project, "actual_" + name
+            )) for name in self.STATS if getattr(
+             project, name
+            ) != getattr(project, "actual_" + name)]
+            if changes:
+                drifted.append(project.id)
+                self.stdout.write("Project {} ({}): {}".format(
+                 project.id, project.name, ", ".join(
+                  "{} {} -> {}".format(*change) for change in changes
+                 )
+                ))
+        if not options["dry_run"]:
+            Project.objects.filter(id__in=drifted).refresh_stats()
+        self.stdout.write("{} project{} drifted{}".format(
+         len(drifted), "" if len(drifted) == 1 else "s",
+         "" if options["dry_run"] else ", all rebuilt"
+        ))
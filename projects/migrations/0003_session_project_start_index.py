@@ -0,0 +1,17 @@
+# Generated by Django 2.0.2 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_session_notes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['project', 'start'], name='sessions_project_e9b7bd_idx'),
+        ),
+    ]
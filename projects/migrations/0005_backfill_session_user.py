@@ -0,0 +1,37 @@
+"""Copies each session's project's user onto the session. The table is walked
+in ranges of primary keys, each updated in its own short transaction, so that
+no lock is held on the whole table while it runs."""
+
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+def backfill_session_users(apps, schema_editor):
+    Session = apps.get_model("projects", "Session")
+    Project = apps.get_model("projects", "Project")
+    project_user = Project.objects.filter(
+     id=OuterRef("project_id")
+    ).values("user_id")[:1]
+    last_id = Session.objects.aggregate(last=Max("id"))["last"] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Session.objects.filter(
+             id__gte=first_id, id__lt=first_id + BATCH_SIZE, user__isnull=True
+            ).update(user=Subquery(project_user))
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('projects', '0004_session_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_session_users, migrations.RunPython.noop, elidable=True
+        ),
+    ]
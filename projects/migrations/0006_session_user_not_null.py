@@ -0,0 +1,24 @@
+# Generated by Django 2.0.2 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_backfill_session_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['user', 'start'], name='sessions_user_id_834181_idx'),
+        ),
+    ]
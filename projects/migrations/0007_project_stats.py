@@ -0,0 +1,33 @@
+# Generated by Django 2.0.2 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_session_user_not_null'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='first_start',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_end',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='session_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='total_minutes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
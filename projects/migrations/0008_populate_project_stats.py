@@ -0,0 +1,48 @@
+"""Fills in the stored session totals of existing projects. Projects are
+worked through in ranges of primary keys, each in its own short transaction."""
+
+from django.db import migrations, transaction
+from django.db.models import Count, Max, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from projects.migrations._session_minutes import SessionMinutes
+
+BATCH_SIZE = 1000
+
+def populate_project_stats(apps, schema_editor):
+    Project = apps.get_model("projects", "Project")
+    Session = apps.get_model("projects", "Session")
+    sessions = Session.objects.filter(project=OuterRef("id")).order_by()
+    stats = {
+     "total_minutes": Coalesce(Subquery(sessions.values("project").annotate(
+      total=Sum(SessionMinutes())
+     ).values("total")), 0),
+     "session_count": Coalesce(Subquery(sessions.values("project").annotate(
+      count=Count("id")
+     ).values("count")), 0),
+     "first_start": Subquery(sessions.order_by("start").values("start")[:1]),
+     "last_end": Subquery(sessions.values("project").annotate(
+      last=Max("end")
+     ).values("last"))
+    }
+    last_id = Project.objects.aggregate(last=Max("id"))["last"] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Project.objects.filter(
+             id__gte=first_id, id__lt=first_id + BATCH_SIZE
+            ).update(**stats)
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('projects', '0007_project_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_project_stats, migrations.RunPython.noop, elidable=True
+        ),
+    ]
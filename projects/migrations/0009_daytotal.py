@@ -0,0 +1,38 @@
+# Generated by Django 2.0.13 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0008_populate_project_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DayTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('minutes', models.IntegerField(default=0)),
+                ('session_count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.Project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'day_totals',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='daytotal',
+            index=models.Index(fields=['user', 'date'], name='day_totals_user_id_182c54_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='daytotal',
+            unique_together={('project', 'date')},
+        ),
+    ]
@@ -0,0 +1,47 @@
+"""Fills in the daily totals of existing users, bucketing each user's sessions
+into dates in their current timezone. Each user is done in their own short
+transaction."""
+
+from django.conf import settings
+from django.db import migrations, transaction
+from django.utils import timezone as tz
+from projects.migrations._session_minutes import SessionMinutes
+
+def populate_day_totals(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    Session = apps.get_model("projects", "Session")
+    DayTotal = apps.get_model("projects", "DayTotal")
+    for user in User.objects.all().iterator():
+        counts = {}
+        for project_id, start, minutes in Session.objects.filter(
+         user=user
+        ).annotate(minutes=SessionMinutes()).values_list(
+         "project", "start", "minutes"
+        ).iterator():
+            key = (project_id, tz.localtime(start, user.timezone).date())
+            total = counts.setdefault(key, [0, 0])
+            total[0] += minutes
+            total[1] += 1
+        with transaction.atomic():
+            DayTotal.objects.bulk_create([DayTotal(
+             user=user, project_id=project_id, date=date,
+             minutes=minutes, session_count=count
+            ) for (project_id, date), (minutes, count) in counts.items()],
+             batch_size=500)
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0009_daytotal'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_day_totals, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.2 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_populate_day_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='duration_minutes',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
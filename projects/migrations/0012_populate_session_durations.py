@@ -0,0 +1,34 @@
+"""Stores the duration of every existing session, worked out in the database
+with the same arithmetic as ``Session.duration``. Sessions are worked through
+in ranges of primary keys, each in its own short transaction."""
+
+from django.db import migrations, transaction
+from django.db.models import Max
+from projects.migrations._session_minutes import SessionMinutes
+
+BATCH_SIZE = 5000
+
+def populate_session_durations(apps, schema_editor):
+    Session = apps.get_model("projects", "Session")
+    last_id = Session.objects.aggregate(last=Max("id"))["last"] or 0
+    for first_id in range(1, last_id + 1, BATCH_SIZE):
+        with transaction.atomic():
+            Session.objects.filter(
+             id__gte=first_id, id__lt=first_id + BATCH_SIZE
+            ).update(duration_minutes=SessionMinutes())
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('projects', '0011_session_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_session_durations, migrations.RunPython.noop, elidable=True
+        ),
+    ]
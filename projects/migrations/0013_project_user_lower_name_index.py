@@ -0,0 +1,33 @@
+"""Adds an index on each project's user and lower-cased name, so that the
+projects whose names start with some text can be found without reading all
+of a user's projects. Django can't declare an index on an expression, so it is
+created here directly. On PostgreSQL the name is indexed with the pattern
+operator class, which ``LIKE 'prefix%'`` lookups need whatever the database's
+collation."""
+
+from django.db import migrations
+
+def create_index(apps, schema_editor):
+    operators = ""
+    if schema_editor.connection.vendor == "postgresql":
+        operators = " text_pattern_ops"
+    schema_editor.execute(
+     "CREATE INDEX projects_user_lower_name_idx ON projects "
+     "(user_id, LOWER(name){})".format(operators)
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX projects_user_lower_name_idx")
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_populate_session_durations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,53 @@
+"""A frozen copy of ``projects.models.SessionMinutes``, for the data
+migrations which work out session durations in the database. It is kept here
+rather than imported from the models, so that later changes to the models
+can't change what those migrations do. The leading underscore stops the
+migration loader treating this module as a migration."""
+
+from django.db.models import F, Func, IntegerField
+
+class SessionMinutes(Func):
+    """A database expression for the length of a session in minutes,
+    accounting for breaks, giving exactly the same integers as
+    ``Session.duration``."""
+
+    seconds_template = "CAST((%s) / 1000000 AS INTEGER)"
+
+    def __init__(self, start="start", end="end", breaks="breaks"):
+        Func.__init__(self, *[
+         F(value) if isinstance(value, str) else value
+         for value in (start, end, breaks)
+        ], output_field=IntegerField())
+
+
+    def as_sql(self, compiler, connection, seconds_template=None):
+        start, end, breaks = [
+         compiler.compile(e) for e in self.get_source_expressions()
+        ]
+        interval, params = connection.ops.subtract_temporals(
+         "DateTimeField", end, start
+        )
+        seconds = (seconds_template or self.seconds_template) % interval
+        day_seconds = "(({0} %% 86400) + 86400) %% 86400".format(seconds)
+        sql = "(({0} - {1}) / 86400 * 1440 + ({1} - 60 * {2}) / 60)".format(
+         seconds, day_seconds, breaks[0]
+        )
+        return sql, params * 3 + breaks[1]
+
+
+    def as_sqlite(self, compiler, connection):
+        """SQLite subtracts timestamps with a Python function which can't
+        handle nulls, so sessions missing from an outer join are skipped."""
+
+        sql, params = self.as_sql(compiler, connection)
+        end = compiler.compile(self.get_source_expressions()[1])
+        return "CASE WHEN {} IS NULL THEN NULL ELSE {} END".format(
+         end[0], sql
+        ), end[1] + params
+
+
+    def as_postgresql(self, compiler, connection):
+        return self.as_sql(
+         compiler, connection,
+         seconds_template="CAST(FLOOR(EXTRACT(EPOCH FROM %s)) AS INTEGER)"
+        )
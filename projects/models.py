@@ -3,16 +3,272 @@
 from datetime import date, datetime, timedelta
 import pytz
 from calendar import monthrange
-from itertools import groupby
+from itertools import groupby, islice
 from timezone_field import TimeZoneField
 from django.utils import timezone as tz
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
-from django.db.models import F, ExpressionWrapper
-from django.db.models.functions import Cast
+from core import caching
+from django.db.models import F, ExpressionWrapper, Func, Sum, Count, Max
+from django.db.models import Value, Case, When, Subquery, OuterRef, Q
+from django.db.models.functions import Cast, Coalesce, Least, Greatest, Lower
+from django.db.models.functions import TruncDate
 User = get_user_model()
 
+def local_day_bounds(day, timezone):
+    """Takes a date and a pytz timezone, and returns the aware datetimes of
+    local midnight on that date and local midnight on the next date - the
+    half-open range that the date covers. Each midnight is localised on its
+    own, so days where the clocks change are 23 or 25 hours long. Where midnight
+    is skipped or repeated by a clock change, the standard time reading of it is
+    used."""
+
+    return tuple(timezone.normalize(timezone.localize(
+     datetime.combine(d, datetime.min.time()), is_dst=False
+    )) for d in (day, day + timedelta(days=1)))
+
+
+
+class SessionMinutes(Func):
+    """A database expression for the length of a session in minutes,
+    accounting for breaks. It gives exactly the same integers as
+    ``Session.duration``, including the way ``timedelta`` splits a session
+    into days and seconds, so it can be summed or sorted on in SQL.
+
+    The field names can be overridden to reach sessions through a relation,
+    such as ``session__start`` from a project, or replaced with expressions
+    for the new values of an update."""
+
+    seconds_template = "CAST((%s) / 1000000 AS INTEGER)"
+
+    def __init__(self, start="start", end="end", breaks="breaks"):
+        Func.__init__(self, *[
+         F(value) if isinstance(value, str) else value
+         for value in (start, end, breaks)
+        ], output_field=models.IntegerField())
+
+
+    def as_sql(self, compiler, connection, seconds_template=None):
+        start, end, breaks = [
+         compiler.compile(e) for e in self.get_source_expressions()
+        ]
+        interval, params = connection.ops.subtract_temporals(
+         "DateTimeField", end, start
+        )
+        seconds = (seconds_template or self.seconds_template) % interval
+        day_seconds = "(({0} %% 86400) + 86400) %% 86400".format(seconds)
+        sql = "(({0} - {1}) / 86400 * 1440 + ({1} - 60 * {2}) / 60)".format(
+         seconds, day_seconds, breaks[0]
+        )
+        return sql, params * 3 + breaks[1]
+
+
+    def as_sqlite(self, compiler, connection):
+        """SQLite subtracts timestamps with a Python function which can't
+        handle nulls, so sessions missing from an outer join are skipped."""
+
+        sql, params = self.as_sql(compiler, connection)
+        end = compiler.compile(self.get_source_expressions()[1])
+        return "CASE WHEN {} IS NULL THEN NULL ELSE {} END".format(
+         end[0], sql
+        ), end[1] + params
+
+
+    def as_postgresql(self, compiler, connection):
+        return self.as_sql(
+         compiler, connection,
+         seconds_template="CAST(FLOOR(EXTRACT(EPOCH FROM %s)) AS INTEGER)"
+        )
+
+
+
+class SessionQuerySet(models.QuerySet):
+    """Queries over sessions which keep their stored durations correct, and can
+    add them up in the database rather than by loading every session."""
+
+    def with_duration(self):
+        """Annotates each session with its stored duration in minutes, as
+        ``minutes``."""
+
+        return self.annotate(minutes=F("duration_minutes"))
+
+
+    def group_by_local_date(self):
+        """Groups the sessions into ``Day`` objects by the date they started on
+        in the current timezone, newest day first, with each day's sessions in
+        the order they started. The local dates and the total of each day are
+        worked out by the database rather than session by session.
+
+        SQL queries: 2"""
+
+        sessions = self.annotate(local_date=TruncDate("start"))
+        totals = dict(sessions.order_by().values("local_date").annotate(
+         total=Sum("duration_minutes")
+        ).values_list("local_date", "total"))
+        return [Day(group, day=day, total_duration=totals[day]) for day, group in
+         groupby(sessions.order_by("-local_date", "start", "id").iterator(),
+         key=lambda session: session.local_date)]
+
+
+    def total_duration(self):
+        """Returns the sum of the sessions' durations in minutes, using a
+        single aggregate query.
+
+        SQL queries: 1"""
+
+        return self.aggregate(
+         total=Coalesce(Sum("duration_minutes"), 0)
+        )["total"]
+
+
+    def bulk_create(self, objs, *args, refresh=True, **kwargs):
+        """Creates sessions without calling their save methods, so the user is
+        copied over from each project and the duration is worked out here, and
+        the stored totals of their projects and days are recalculated
+        afterwards. Callers inserting many batches can pass ``refresh=False``
+        and call ``refresh_totals`` once themselves at the end."""
+
+        objs = list(objs)
+        for session in objs:
+            if session.user_id is None:
+                session.user_id = session.project.user_id
+            session.duration_minutes = session.duration()
+        created = models.QuerySet.bulk_create(self, objs, *args, **kwargs)
+        if refresh:
+            self.refresh_totals({(s.user_id, s.project_id) for s in objs})
+        return created
+
+
+    def bulk_insert(self, sessions, batch_size):
+        """Inserts unsaved sessions from an iterable in batches, each in its
+        own transaction, so that they never all have to be held at once. The
+        stored totals are recalculated once, after the last batch. Returns how
+        many sessions were inserted."""
+
+        sessions, involved, inserted = iter(sessions), set(), 0
+        while True:
+            batch = list(islice(sessions, batch_size))
+            if not batch: break
+            with transaction.atomic():
+                self.bulk_create(batch, refresh=False)
+            involved |= {(s.user_id, s.project_id) for s in batch}
+            inserted += len(batch)
+        with transaction.atomic():
+            self.refresh_totals(involved)
+        return inserted
+
+
+    def update(self, **kwargs):
+        """Updates the sessions, and if anything that the stored totals depend
+        on has changed, recalculates them for every project involved. If the
+        times or breaks change, the stored durations are worked out again from
+        the new values in the same query."""
+
+        if not set(kwargs) & {"start", "end", "breaks", "project"}:
+            return models.QuerySet.update(self, **kwargs)
+        if set(kwargs) & {"start", "end", "breaks"}:
+            kwargs["duration_minutes"] = SessionMinutes(*[
+             name if name not in kwargs else kwargs[name] if hasattr(
+              kwargs[name], "resolve_expression"
+             ) else Value(kwargs[name], output_field=Session._meta.get_field(
+              name
+             )) for name in ("start", "end", "breaks")
+            ])
+        involved = set(self.values_list("user", "project"))
+        if "project" in kwargs:
+            project = kwargs["project"]
+            if not isinstance(project, Project):
+                project = Project.objects.get(id=project)
+            involved |= {(project.user_id, project.id)}
+        rows = models.QuerySet.update(self, **kwargs)
+        self.refresh_totals(involved)
+        return rows
+
+
+    def delete(self):
+        """Deletes the sessions and recalculates the stored totals of their
+        projects and days."""
+
+        involved = set(self.values_list("user", "project"))
+        deleted = models.QuerySet.delete(self)
+        self.refresh_totals(involved)
+        return deleted
+
+
+    @staticmethod
+    def refresh_totals(involved):
+        """Takes a set of (user ID, project ID) pairs touched by a bulk
+        operation, recalculates the stored totals of those projects and of
+        their days, and marks all of those users' cached pages as stale."""
+
+        Project.objects.filter(id__in={p for u, p in involved}).refresh_stats()
+        for user in User.objects.filter(id__in={u for u, p in involved}):
+            DayTotal.objects.rebuild(
+             user, project_ids={p for u, p in involved if u == user.id}
+            )
+            caching.bump(user.id, "all")
+            User.bump_data_version(user.id)
+
+
+
+class ProjectQuerySet(models.QuerySet):
+    """Queries over projects, including keeping their stored session totals
+    correct."""
+
+    @staticmethod
+    def session_stats():
+        """Returns the expressions which calculate, from a project's sessions,
+        the values its stored session totals should have."""
+
+        sessions = Session.objects.filter(project=OuterRef("id")).order_by()
+        return {
+         "total_minutes": Coalesce(Subquery(sessions.values("project").annotate(
+          total=Sum("duration_minutes")
+         ).values("total")), 0),
+         "session_count": Coalesce(Subquery(sessions.values("project").annotate(
+          count=Count("id")
+         ).values("count")), 0),
+         "first_start": Subquery(
+          sessions.order_by("start").values("start")[:1],
+          output_field=models.DateTimeField()
+         ),
+         "last_end": Subquery(sessions.values("project").annotate(
+          last=Max("end")
+         ).values("last"), output_field=models.DateTimeField())
+        }
+
+
+    def with_prefix(self, prefix):
+        """Narrows the projects down to those whose names start with the given
+        text, ignoring case. The names are lower-cased in the same way as the
+        index on users' project names, so that it can be used."""
+
+        return self.annotate(lower_name=Lower("name")).filter(
+         lower_name__startswith=prefix.lower()
+        )
+
+
+    def with_session_stats(self):
+        """Annotates each project with the values its stored session totals
+        should have, prefixed with ``actual_``."""
+
+        return self.annotate(**{
+         "actual_" + name: stat for name, stat in self.session_stats().items()
+        })
+
+
+    def refresh_stats(self):
+        """Recalculates the stored session totals of the projects from scratch,
+        in one query. This is used after bulk operations which bypass the
+        incremental updates.
+
+        SQL queries: 1"""
+
+        return self.update(**self.session_stats())
+
+
+
 class Project(models.Model):
     """A project which the user wishes to track time spent on."""
 
@@ -23,49 +279,76 @@ class Project(models.Model):
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    total_minutes = models.IntegerField(default=0, editable=False)
+    session_count = models.IntegerField(default=0, editable=False)
+    first_start = models.DateTimeField(null=True, editable=False)
+    last_end = models.DateTimeField(null=True, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
 
 
     def __str__(self):
         return self.name
 
 
+    def save(self, *args, **kwargs):
+        """Saves the project, and if it already existed, makes sure that its
+        sessions' copy of the user still matches the project's user. If the
+        sessions had to be moved to a new user, the project's daily totals are
+        rebuilt in that user's timezone. Project names appear on most pages, so
+        all of the user's cached pages are marked as stale."""
+
+        adding = self._state.adding
+        models.Model.save(self, *args, **kwargs)
+        if not adding and Session.objects.filter(project=self).exclude(
+         user=self.user_id
+        ).update(user=self.user_id):
+            DayTotal.objects.filter(project=self).delete()
+            DayTotal.objects.rebuild(self.user, project_ids={self.id})
+        caching.bump(self.user_id, "all")
+        User.bump_data_version(self.user_id)
+
+
+    def delete(self, *args, **kwargs):
+        """Deletes the project, marking all of its user's cached pages as
+        stale."""
+
+        deleted = models.Model.delete(self, *args, **kwargs)
+        caching.bump(self.user_id, "all")
+        User.bump_data_version(self.user_id)
+        return deleted
+
+
     def total_time(self):
-        """Returns the sum of all the project's sessions' durations.
+        """Returns the sum of all the project's sessions' durations, which is
+        stored on the project itself.
 
-        SQL queries: 1"""
+        SQL queries: 0"""
 
-        return sum(s.duration() for s in self.session_set.all())
+        return self.total_minutes
 
 
     @classmethod
     def by_user_order(cls, user):
         """Gets all of a user's projects, sorted by either total duration or
         when it was last done, depending on the user's settings. Each project
-        object will be annotated with a duration (in minutes) and a most recent
-        session.
+        object will be annotated with a duration (in minutes) and the end of its
+        most recent session, which is ``None`` if it has never been done. Both
+        are read from the project's stored session totals. Projects which have
+        never been done come last, oldest first.
 
-        SQL queries: 2"""
+        SQL queries: 1"""
 
-        sessions = list(Session.objects.filter(project__user=user).annotate(
-         project_id=models.F("project")
-        ).order_by("start"))
-        projects = {
-         p.id: p for p in Project.objects.filter(user=user).order_by("id")
-        }
-        for project in projects.values():
-            project.duration = 0
-            project.recent = None
-        for session in sessions:
-            projects[session.project_id].duration += session.duration()
-            projects[session.project_id].recent = session
+        projects = cls.objects.filter(user=user).annotate(
+         duration=F("total_minutes"), recent=F("last_end")
+        )
         if user.project_order == "LD":
-            done_projects = [p for p in projects.values() if p.recent]
-            never_projects = [p for p in projects.values() if not p.recent]
-            return list(
-             reversed(sorted(done_projects, key=lambda p: p.recent.end))
-            ) + never_projects
-        else:
-            return reversed(sorted(projects.values(), key=lambda p: p.duration))
+            return projects.order_by(
+             F("recent").desc(nulls_last=True),
+             Case(When(recent=None, then=F("id")), default=F("id") * -1)
+            )
+        return projects.order_by("-duration", "-id")
+
 
 
 class Session(models.Model):
@@ -73,13 +356,144 @@ class Session(models.Model):
 
     class Meta:
         db_table = "sessions"
+        indexes = [
+         models.Index(fields=["project", "start"]),
+         models.Index(fields=["user", "start"])
+        ]
 
     start = models.DateTimeField()
     end = models.DateTimeField()
     timezone = TimeZoneField()
     breaks = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, editable=False)
     notes = models.TextField(blank=True)
+    duration_minutes = models.IntegerField(default=0, editable=False)
+
+    objects = SessionQuerySet.as_manager()
+
+    STATS_FIELDS = ("project_id", "start", "end", "duration_minutes")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers the values the session was loaded with, so that when it is
+        saved or deleted its old contribution to its project's stored totals
+        can be taken away."""
+
+        session = super().from_db(db, field_names, values)
+        if set(cls.STATS_FIELDS) <= set(field_names):
+            session._loaded_stats = [getattr(session, f) for f in cls.STATS_FIELDS]
+        return session
+
+
+    def save(self, *args, **kwargs):
+        """Saves the session, first copying the user over from its project so
+        that a user's sessions can be looked up without a join, and storing its
+        duration so that it never has to be worked out again. The stored
+        totals of the project and day it was in before, and of the project and
+        day it is in now, are updated to match, and the cached pages showing
+        it are marked as stale.
+
+        SQL queries: 6 - one more if the session was changed without being
+        loaded first, and one more if its user wasn't already attached."""
+
+        old = None
+        if not self._state.adding:
+            old = getattr(self, "_loaded_stats", None) or list(
+             Session.objects.filter(id=self.id).values_list(*self.STATS_FIELDS)
+            )[0]
+        if self.user_id != self.project.user_id:
+            self.user = self.project.user
+        self.duration_minutes = self.duration()
+        models.Model.save(self, *args, **kwargs)
+        if old:
+            self.remove_from_project_stats(*old)
+            DayTotal.objects.add(
+             self.user, old[0], Session(start=old[1]).local_date(
+              self.user.timezone
+             ), -old[3], -1
+            )
+        self.add_to_project_stats()
+        DayTotal.objects.add(
+         self.user, self.project_id, self.local_date(self.user.timezone),
+         self.duration_minutes
+        )
+        scopes = self.page_scopes(self.project_id, self.start, self.user.timezone)
+        if old:
+            scopes += self.page_scopes(old[0], old[1], self.user.timezone)
+        caching.bump(self.user_id, *scopes)
+        User.bump_data_version(self.user_id)
+        self._loaded_stats = [getattr(self, f) for f in self.STATS_FIELDS]
+
+
+    def delete(self, *args, **kwargs):
+        """Deletes the session, takes it away from its project's and day's
+        stored totals, and marks the cached pages showing it as stale."""
+
+        old = getattr(self, "_loaded_stats", None) or [
+         getattr(self, f) for f in self.STATS_FIELDS
+        ]
+        deleted = models.Model.delete(self, *args, **kwargs)
+        self.remove_from_project_stats(*old)
+        DayTotal.objects.add(
+         self.user, old[0], Session(start=old[1]).local_date(self.user.timezone),
+         -old[3], -1
+        )
+        caching.bump(
+         self.user_id, *self.page_scopes(old[0], old[1], self.user.timezone)
+        )
+        User.bump_data_version(self.user_id)
+        return deleted
+
+
+    @staticmethod
+    def page_scopes(project_id, start, timezone):
+        """The cache scopes of the pages that show a session in a project
+        starting at a given time, including the projects list which shows
+        project totals."""
+
+        date = tz.localtime(start, timezone).date()
+        return [
+         "list", "day:" + date.isoformat(), "month:" + date.strftime("%Y-%m"),
+         "project:{}".format(project_id)
+        ]
+
+
+    def add_to_project_stats(self):
+        """Adds the session to its project's stored totals, without needing to
+        look at any of its other sessions.
+
+        SQL queries: 1"""
+
+        start = Value(self.start, output_field=models.DateTimeField())
+        end = Value(self.end, output_field=models.DateTimeField())
+        Project.objects.filter(id=self.project_id).update(
+         total_minutes=F("total_minutes") + self.duration_minutes,
+         session_count=F("session_count") + 1,
+         first_start=Least(Coalesce("first_start", start), start),
+         last_end=Greatest(Coalesce("last_end", end), end)
+        )
+
+
+    def remove_from_project_stats(self, project_id, start, end, minutes):
+        """Takes a session with the given values away from a project's stored
+        totals. The first start and last end only need to be looked up again
+        from the remaining sessions if this session was the one that set them.
+
+        SQL queries: 1"""
+
+        sessions = Session.objects.filter(project=OuterRef("id")).order_by()
+        Project.objects.filter(id=project_id).update(
+         total_minutes=F("total_minutes") - minutes,
+         session_count=F("session_count") - 1,
+         first_start=Case(When(first_start=start, then=Subquery(
+          sessions.order_by("start").values("start")[:1]
+         )), default=F("first_start"), output_field=models.DateTimeField()),
+         last_end=Case(When(last_end=end, then=Subquery(sessions.values(
+          "project"
+         ).annotate(last=Max("end")).values("last"))), default=F("last_end"),
+         output_field=models.DateTimeField())
+        )
 
 
     def local_start(self):
@@ -100,8 +514,36 @@ class Session(models.Model):
         return tz.localtime(utc_end)
 
 
+    def cursor(self):
+        """A string marking the session's place in the ordering of sessions by
+        start and then ID, for use in the links between pages."""
+
+        return "{:%Y%m%d%H%M%S%f}-{}".format(
+         self.start.astimezone(pytz.UTC), self.id
+        )
+
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """Turns a string made by ``cursor`` back into a UTC start time and an
+        ID. A ``ValueError`` is raised if the string is not a valid cursor."""
+
+        start, id = cursor.split("-")
+        return pytz.UTC.localize(
+         datetime.strptime(start, "%Y%m%d%H%M%S%f")
+        ), int(id)
+
+
+    def local_date(self, timezone):
+        """The date on which the session started, in the given timezone."""
+
+        return tz.localtime(self.start, timezone).date()
+
+
     def duration(self):
-        """The length of the session in minutes, accounting for breaks."""
+        """The length of the session in minutes, accounting for breaks. This is
+        worked out from the session's times, and is stored as
+        ``duration_minutes`` whenever the session is saved."""
 
         minutes = 0
         delta = self.end - self.start
@@ -115,14 +557,14 @@ class Session(models.Model):
     def from_day(cls, user, day):
         """Gets all the user's sessions from a given day, as a ``Day`` object.
         The day will just be an ordinary date object with no timezone awareness,
-        and should be the date in the user's timezone, as when the database is
-        searched the dates there will be converted to that timezone.
+        and should be the date in the user's timezone. It is turned into a range
+        of UTC times so that the lookup can use the index on session starts.
 
         SQL queries: 1"""
 
+        start, end = local_day_bounds(day, user.timezone)
         sessions = cls.objects.filter(
-         project__user=user, start__year=day.year,
-         start__month=day.month, start__day=day.day
+         user=user, start__gte=start, start__lt=end
         ).annotate(
          project_id=models.F("project"), project_name=models.F("project__name")
         ).order_by("start")
@@ -130,13 +572,104 @@ class Session(models.Model):
 
 
 
+class DayTotalQuerySet(models.QuerySet):
+    """Queries over the stored daily totals, including keeping them correct."""
+
+    def add(self, user, project_id, date, minutes, sessions=1):
+        """Adds some minutes and sessions to the stored total for a project on
+        a date, creating the total if it isn't there yet. Negative values take
+        a session away.
+
+        SQL queries: 1, or 2 if the total is new."""
+
+        updated = self.filter(project_id=project_id, date=date).update(
+         minutes=F("minutes") + minutes,
+         session_count=F("session_count") + sessions
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    self.create(
+                     user=user, project_id=project_id, date=date,
+                     minutes=minutes, session_count=sessions
+                    )
+            except IntegrityError:
+                self.add(user, project_id, date, minutes, sessions)
+
+
+    def rebuild(self, user, project_ids=None):
+        """Throws away a user's stored daily totals and recalculates them from
+        their sessions, bucketing the sessions into dates using the user's
+        current timezone. The rebuild can be limited to some projects.
+
+        SQL queries: 3"""
+
+        sessions = Session.objects.filter(user=user)
+        totals = self.filter(user=user)
+        if project_ids is not None:
+            sessions = sessions.filter(project__in=project_ids)
+            totals = totals.filter(project__in=project_ids)
+        counts = {}
+        for project_id, start, minutes in sessions.values_list(
+         "project", "start", "duration_minutes"
+        ).iterator():
+            key = (project_id, tz.localtime(start, user.timezone).date())
+            total = counts.setdefault(key, [0, 0])
+            total[0] += minutes
+            total[1] += 1
+        with transaction.atomic():
+            totals.delete()
+            self.bulk_create([DayTotal(
+             user=user, project_id=project_id, date=date,
+             minutes=minutes, session_count=count
+            ) for (project_id, date), (minutes, count) in counts.items()],
+             batch_size=500)
+
+
+    def by_date(self):
+        """Adds up the per-project totals into one total per date, giving
+        ordered dicts of ``date``, ``total_minutes`` and ``sessions``. Dates
+        with no sessions are left out.
+
+        SQL queries: 1"""
+
+        return self.filter(session_count__gt=0).values("date").annotate(
+         total_minutes=Sum("minutes"), sessions=Sum("session_count")
+        ).values("date", "total_minutes", "sessions").order_by("date")
+
+
+
+class DayTotal(models.Model):
+    """The total time a user spent on one project on one date, kept up to date
+    as sessions are written so that summaries of long periods don't have to
+    read every session. The date is the session start's date in the user's
+    timezone, so a user's totals must be rebuilt when that changes."""
+
+    class Meta:
+        db_table = "day_totals"
+        unique_together = (("project", "date"),)
+        indexes = [models.Index(fields=["user", "date"])]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    date = models.DateField()
+    minutes = models.IntegerField(default=0)
+    session_count = models.IntegerField(default=0)
+
+    objects = DayTotalQuerySet.as_manager()
+
+
+
 class Day:
-    """A day of sessions."""
+    """A day of sessions. Its total duration is added up from the sessions,
+    unless the database has already worked it out."""
 
-    def __init__(self, session_set, day=None):
+    def __init__(self, session_set, day=None, total_duration=None):
         self.sessions = list(session_set)
         self.day = day
-        self.total_duration = sum(s.duration() for s in self.sessions)
+        self.total_duration = sum(
+         s.duration_minutes for s in self.sessions
+        ) if total_duration is None else total_duration
 
 
     def __iter__(self):
@@ -173,6 +706,46 @@ class Day:
         )
 
 
+    @classmethod
+    def page(cls, sessions, size, before=None, after=None):
+        """Takes a queryset of sessions and returns one page of them as a list
+        of days, newest first, along with the cursors of the pages of older and
+        newer sessions (``None`` where there are none).
+
+        Pages are found by their position in the ordering by start and ID,
+        either going back from the ``before`` cursor or forward from the
+        ``after`` cursor. A page holds at least ``size`` sessions where there
+        are enough, and is then finished off with the rest of its last day so
+        that no day is split between pages. The sessions are streamed from the
+        database, so only about one page is ever held in memory.
+
+        SQL queries: 1"""
+
+        if after:
+            start, id = Session.parse_cursor(after)
+            sessions = sessions.filter(
+             Q(start__gt=start) | Q(start=start, id__gt=id)
+            ).order_by("start", "id")
+        else:
+            if before:
+                start, id = Session.parse_cursor(before)
+                sessions = sessions.filter(
+                 Q(start__lt=start) | Q(start=start, id__lt=id)
+                )
+            sessions = sessions.order_by("-start", "-id")
+        page, more = [], False
+        for session in sessions.iterator(chunk_size=size):
+            date = session.local_start().date()
+            if len(page) >= size and date != page[-1].local_start().date():
+                more = True
+                break
+            page.append(session)
+        if not after: page.reverse()
+        older = page[0].cursor() if page and (after or more) else None
+        newer = page[-1].cursor() if page and (before or (after and more)) else None
+        return cls.group_sessions_by_local_date(page), older, newer
+
+
     @staticmethod
     def group_sessions_by_local_date(sessions):
         """Takes a set of sessions, groups them into local days, and makes a
@@ -185,18 +758,26 @@ class Day:
         return groups
 
 
-    @staticmethod
-    def insert_empty_month_days(days, year, month):
+    @classmethod
+    def calendar(cls, days, start, end):
+        """Takes some ``Day`` objects and returns a dense list of days covering
+        every date from ``start`` to ``end`` inclusive, oldest first. Dates
+        without a ``Day`` get an empty one, and days outside the range are left
+        out. This takes linear time, so it works for any length of range."""
+
+        by_date = {day.day: day for day in days}
+        return [by_date.get(date) or cls([], day=date) for date in (
+         start + timedelta(days=n) for n in range((end - start).days + 1)
+        )]
+
+
+    @classmethod
+    def insert_empty_month_days(cls, days, year, month):
         """Inserts empty ``Day`` objects into a list to fill out a given month.
         It will also remove days in the future based on the user's local
-        time."""
+        time. The list is newest first, and is modified in place."""
 
-        month_days = [date(year, month, day) for day in range(
-         1, monthrange(year, month)[1] + 1
-        )]
-        days.reverse()
-        for day in month_days:
-            if day not in [d.day for d in days]:
-                days.insert(day.day - 1, Day([], day=day))
-        while days[-1].day > tz.localtime().date(): days.pop()
-        days.reverse()
+        last = date(year, month, monthrange(year, month)[1])
+        days[:] = reversed(cls.calendar(
+         days, date(year, month, 1), min(last, tz.localtime().date())
+        ))
@@ -0,0 +1,291 @@
+import json
+from datetime import datetime
+from django.db import connection
+import pytz
+from testarsenal import DjangoTest
+from mixer.backend.django import mixer
+from projects.models import *
+from projects.api import suggestion_cache, project_suggestions
+
+class ApiTest(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User, timezone=pytz.timezone("Europe/London"))
+        self.client.force_login(self.user)
+        self.project = Project.objects.create(name="AAA", user=self.user)
+        self.sessions = [Session.objects.create(
+         start=datetime(2008, 6, day, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 6, day, 10, 30, tzinfo=pytz.UTC),
+         breaks=day, project=self.project, timezone=pytz.UTC
+        ) for day in (1, 2, 3)]
+
+
+    def send(self, method, path, data):
+        return getattr(self.client, method)(
+         path, json.dumps(data), content_type="application/json"
+        )
+
+
+
+class SessionListApiTests(ApiTest):
+
+    def test_sessions_are_listed_newest_first_with_durations(self):
+        response = self.client.get("/api/v1/sessions/")
+        self.assertEqual(response.status_code, 200)
+        sessions = response.json()["sessions"]
+        self.assertEqual([s["id"] for s in sessions], [
+         s.id for s in reversed(self.sessions)
+        ])
+        self.assertEqual(sessions[0], {
+         "id": self.sessions[2].id, "project": self.project.id,
+         "start": "2008-06-03T10:00:00+01:00", "end": "2008-06-03T11:30:00+01:00",
+         "breaks": 3, "minutes": 87, "timezone": "UTC", "notes": ""
+        })
+        self.assertIsNone(response.json()["before"])
+
+
+    def test_sessions_are_paged_with_cursor(self):
+        response = self.client.get("/api/v1/sessions/?limit=2").json()
+        self.assertEqual(len(response["sessions"]), 2)
+        response = self.client.get(
+         "/api/v1/sessions/?limit=2&before=" + response["before"]
+        ).json()
+        self.assertEqual(
+         [s["id"] for s in response["sessions"]], [self.sessions[0].id]
+        )
+        self.assertIsNone(response["before"])
+
+
+    def test_sessions_can_be_filtered(self):
+        other = Project.objects.create(name="BBB", user=self.user)
+        response = self.client.get(
+         "/api/v1/sessions/?start=2008-06-02&end=2008-06-02"
+        ).json()
+        self.assertEqual(
+         [s["id"] for s in response["sessions"]], [self.sessions[1].id]
+        )
+        response = self.client.get(
+         "/api/v1/sessions/?project={}".format(other.id)
+        ).json()
+        self.assertEqual(response["sessions"], [])
+
+
+    def test_bad_queries_are_rejected(self):
+        for query in (
+         "limit=0", "start=june", "before=xxx", "project=A", "end=9999-12-31"
+        ):
+            response = self.client.get("/api/v1/sessions/?" + query)
+            self.assertEqual(response.status_code, 400)
+
+
+    def test_other_users_sessions_are_hidden(self):
+        self.client.force_login(mixer.blend(User))
+        self.assertEqual(
+         self.client.get("/api/v1/sessions/").json()["sessions"], []
+        )
+
+
+    def test_api_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/v1/sessions/").status_code, 401)
+        self.assertEqual(self.client.get("/api/v1/projects/").status_code, 401)
+
+
+    def test_api_rejects_bad_methods_and_bodies(self):
+        self.assertEqual(self.client.put("/api/v1/sessions/").status_code, 405)
+        response = self.client.post(
+         "/api/v1/sessions/", "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+
+class SessionWriteApiTests(ApiTest):
+
+    def test_can_create_sessions_in_bulk(self):
+        response = self.send("post", "/api/v1/sessions/", {"sessions": [
+         {"start": "2008-07-01 09:00", "end": "2008-07-01 10:00",
+          "project": "AAA"},
+         {"start": "2008-07-02T09:00", "end": "2008-07-02T09:30",
+          "breaks": 5, "project": self.project.id, "notes": "N"}
+        ]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+         [s["minutes"] for s in response.json()["sessions"]], [60, 25]
+        )
+        session = Session.objects.get(notes="N")
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(
+         session.start, datetime(2008, 7, 2, 8, 0, tzinfo=pytz.UTC)
+        )
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.session_count, 5)
+        self.assertEqual(self.project.total_minutes, 264 + 85)
+
+
+    def test_invalid_sessions_create_nothing(self):
+        response = self.send("post", "/api/v1/sessions/", {"sessions": [
+         {"start": "2008-07-01 09:00", "end": "2008-07-01 10:00",
+          "project": "AAA"},
+         {"start": "2008-07-02 09:00", "end": "2008-07-02 08:00",
+          "project": "AAA"},
+         {"start": "2008-07-02 09:00", "end": "2008-07-02 10:00",
+          "project": "ZZZ"},
+         "session"
+        ]})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(set(errors), {"1", "2", "3"})
+        self.assertEqual(errors["1"]["end"], ["End time is before start time"])
+        self.assertEqual(errors["2"]["project"], ["Invalid project name"])
+        self.assertEqual(Session.objects.count(), 3)
+
+
+    def test_can_update_sessions_in_bulk(self):
+        other = Project.objects.create(name="BBB", user=self.user)
+        response = self.send("patch", "/api/v1/sessions/", {"sessions": [
+         {"id": self.sessions[0].id, "breaks": 0},
+         {"id": self.sessions[1].id, "project": "BBB",
+          "end": "2008-06-02 12:00"},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+         [s["minutes"] for s in response.json()["sessions"]], [118, 90]
+        )
+        self.sessions[0].refresh_from_db()
+        self.assertEqual(self.sessions[0].breaks, 0)
+        self.assertEqual(
+         self.sessions[0].start, datetime(2008, 6, 1, 9, 0, tzinfo=pytz.UTC)
+        )
+        other.refresh_from_db()
+        self.assertEqual((other.session_count, other.total_minutes), (1, 118))
+
+
+    def test_updates_need_valid_sessions(self):
+        stranger = Session.objects.create(
+         start=datetime(2008, 6, 1, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 6, 1, 10, 0, tzinfo=pytz.UTC),
+         project=mixer.blend(Project), timezone=pytz.UTC
+        )
+        response = self.send("patch", "/api/v1/sessions/", {"sessions": [
+         {"id": self.sessions[0].id, "breaks": 0}, {"id": stranger.id}, {}
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["errors"]), {"1", "2"})
+        response = self.send("patch", "/api/v1/sessions/", {"sessions": [
+         {"id": self.sessions[0].id, "breaks": 0},
+         {"id": self.sessions[1].id, "breaks": 100}
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.sessions[0].refresh_from_db()
+        self.assertEqual(self.sessions[0].breaks, 1)
+
+
+    def test_can_delete_sessions_in_bulk(self):
+        response = self.send("delete", "/api/v1/sessions/", {"ids": [
+         self.sessions[0].id, self.sessions[1].id, 999
+        ]})
+        self.assertEqual(response.json(), {"deleted": 2})
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.session_count, 1)
+        response = self.send("delete", "/api/v1/sessions/", {"ids": "all"})
+        self.assertEqual(response.status_code, 400)
+
+
+
+class ProjectApiTests(ApiTest):
+
+    def test_can_list_projects(self):
+        response = self.client.get("/api/v1/projects/")
+        self.assertEqual(response.json(), {"projects": [{
+         "id": self.project.id, "name": "AAA", "minutes": 264, "sessions": 3,
+         "first_start": "2008-06-01T10:00:00+01:00",
+         "last_end": "2008-06-03T11:30:00+01:00"
+        }]})
+
+
+    def test_can_create_project(self):
+        response = self.send("post", "/api/v1/projects/", {"name": "BBB"})
+        self.assertEqual(response.status_code, 201)
+        project = Project.objects.get(name="BBB")
+        self.assertEqual(project.user, self.user)
+        self.assertEqual(response.json()["id"], project.id)
+        response = self.send("post", "/api/v1/projects/", {"name": "BBB"})
+        self.assertEqual(response.status_code, 400)
+        response = self.send("post", "/api/v1/projects/", {})
+        self.assertEqual(
+         response.json(), {"errors": {"name": ["Invalid project name"]}}
+        )
+
+
+    def test_can_get_rename_and_delete_project(self):
+        path = "/api/v1/projects/{}/".format(self.project.id)
+        self.assertEqual(self.client.get(path).json()["name"], "AAA")
+        response = self.send("patch", path, {"name": "CCC"})
+        self.assertEqual(response.json()["name"], "CCC")
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.name, "CCC")
+        self.assertEqual(self.client.delete(path).json(), {"deleted": 1})
+        self.assertFalse(Project.objects.exists())
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+
+    def test_other_users_projects_are_hidden(self):
+        self.client.force_login(mixer.blend(User))
+        path = "/api/v1/projects/{}/".format(self.project.id)
+        self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(self.client.delete(path).status_code, 404)
+
+
+
+
+class ProjectSuggestionApiTests(ApiTest):
+
+    def setUp(self):
+        ApiTest.setUp(self)
+        suggestion_cache.clear()
+        self.other = Project.objects.create(name="abacus", user=self.user)
+        Session.objects.create(
+         start=datetime(2008, 7, 1, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 7, 1, 9, 30, tzinfo=pytz.UTC),
+         project=self.other, timezone=pytz.UTC
+        )
+        Project.objects.create(name="Zeta", user=self.user)
+        Project.objects.create(name="Alpha", user=mixer.blend(User))
+
+
+    def suggest(self, q):
+        response = self.client.get("/api/v1/projects/suggest/", {"q": q})
+        return [project["name"] for project in response.json()["projects"]]
+
+
+    def test_suggestions_match_prefix_in_project_order(self):
+        self.assertEqual(self.suggest("a"), ["AAA", "abacus"])
+        self.assertEqual(self.suggest("AB"), ["abacus"])
+        self.assertEqual(self.suggest("x"), [])
+        self.user.refresh_from_db()
+        self.user.project_order = "LD"
+        self.user.save()
+        self.assertEqual(self.suggest("a"), ["abacus", "AAA"])
+
+
+    def test_suggestions_are_cached_until_data_changes(self):
+        self.suggest("a")
+        self.user.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(project_suggestions(self.user, "a"), [
+             (self.project.id, "AAA"), (self.other.id, "abacus")
+            ])
+            self.assertEqual(
+             project_suggestions(self.user, "aB"), [(self.other.id, "abacus")]
+            )
+        Project.objects.create(name="Abbey", user=self.user)
+        self.assertEqual(self.suggest("ab"), ["abacus", "Abbey"])
+
+
+    def test_prefix_index_exists(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+             cursor, "projects"
+            )
+        self.assertIn("projects_user_lower_name_idx", constraints)
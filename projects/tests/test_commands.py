@@ -0,0 +1,301 @@
+from datetime import datetime, date
+import json
+import os
+import tempfile
+from io import StringIO
+import pytz
+from testarsenal import DjangoTest
+from mixer.backend.django import mixer
+from django.core.management import call_command, CommandError
+from projects.forms import check_session_times
+from projects.models import *
+
+class RebuildProjectStatsTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User)
+        self.project = Project.objects.create(name="AAA", user=self.user)
+        self.session = Session.objects.create(
+         start=datetime(2008, 1, 1, 9, 0, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, 1, 10, 0, 0, tzinfo=pytz.UTC),
+         project=self.project, timezone=pytz.UTC
+        )
+        Project.objects.filter(id=self.project.id).update(
+         total_minutes=5, session_count=3
+        )
+
+
+    def test_can_report_and_fix_drift(self):
+        out = StringIO()
+        call_command("rebuild_project_stats", stdout=out)
+        self.assertIn("total_minutes 5 -> 60", out.getvalue())
+        self.assertIn("session_count 3 -> 1", out.getvalue())
+        self.assertIn("1 project drifted", out.getvalue())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.total_minutes, 60)
+        self.assertEqual(self.project.session_count, 1)
+
+
+    def test_dry_run_leaves_stats_alone(self):
+        out = StringIO()
+        call_command("rebuild_project_stats", dry_run=True, stdout=out)
+        self.assertIn("total_minutes 5 -> 60", out.getvalue())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.total_minutes, 5)
+
+
+    def test_correct_stats_are_not_reported(self):
+        call_command("rebuild_project_stats", stdout=StringIO())
+        out = StringIO()
+        call_command("rebuild_project_stats", stdout=out)
+        self.assertEqual(out.getvalue(), "0 projects drifted, all rebuilt\n")
+
+
+
+class RebuildDayTotalsTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User, username="sam", timezone=pytz.UTC)
+        project = Project.objects.create(name="AAA", user=self.user)
+        Session.objects.create(
+         start=datetime(2008, 1, 1, 23, 0, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, 1, 23, 30, 0, tzinfo=pytz.UTC),
+         project=project, timezone=pytz.UTC
+        )
+        User.objects.filter(id=self.user.id).update(timezone="Pacific/Auckland")
+
+
+    def test_can_rebuild_totals(self):
+        out = StringIO()
+        call_command("rebuild_day_totals", "sam", stdout=out)
+        self.assertEqual(out.getvalue(), "Rebuilt daily totals for 1 user\n")
+        self.assertEqual(
+         list(DayTotal.objects.values_list("date", "minutes")),
+         [(date(2008, 1, 2), 30)]
+        )
+
+
+    def test_unknown_users_are_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command("rebuild_day_totals", "sam", "bob", stdout=StringIO())
+
+
+
+class ImportSessionsTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(
+         User, username="sam", timezone=pytz.timezone("Europe/London")
+        )
+        self.project = Project.objects.create(name="AAA", user=self.user)
+        mixer.blend(User, username="bob", timezone=pytz.UTC)
+
+
+    def write_file(self, suffix, text):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f: f.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+
+    def test_can_import_csv(self):
+        path = self.write_file(".csv", "\n".join([
+         "project,start,end,breaks,notes",
+         "AAA,2008-06-01 09:00,2008-06-01 10:00,10,first",
+         "BBB,2008-06-02 09:00,2008-06-02 09:30,,",
+         "BBB,2008-06-03T09:00:00+00:00,2008-06-03T09:45:00+00:00,0,",
+        ]))
+        out = StringIO()
+        call_command(
+         "import_sessions", path, user="sam", batch_size=2, stdout=out
+        )
+        self.assertIn("Imported 3 sessions, rejected 0", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        session = Session.objects.get(notes="first")
+        self.assertEqual(session.project, self.project)
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(
+         session.start, datetime(2008, 6, 1, 8, 0, tzinfo=pytz.UTC)
+        )
+        self.assertEqual(str(session.timezone), "Europe/London")
+        project = Project.objects.get(name="BBB", user=self.user)
+        self.assertEqual((project.session_count, project.total_minutes), (2, 75))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.total_minutes, 50)
+        self.assertEqual(DayTotal.objects.filter(user=self.user).count(), 3)
+
+
+    def test_can_import_json_lines_for_several_users(self):
+        path = self.write_file(".jsonl", "\n".join([
+         '{"user": "bob", "project": "AAA", "start": "2008-06-01 09:00",'
+         ' "end": "2008-06-01 10:00", "timezone": "Asia/Tokyo"}',
+         "",
+         '{"user": "sam", "project": "AAA", "start": "2008-06-01 09:00",'
+         ' "end": "2008-06-01 10:00"}'
+        ]))
+        call_command("import_sessions", path, stdout=StringIO())
+        bob_session = Session.objects.get(project__user__username="bob")
+        self.assertEqual(
+         bob_session.start, datetime(2008, 6, 1, 0, 0, tzinfo=pytz.UTC)
+        )
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertEqual(self.project.session_set.count(), 1)
+
+
+    def test_invalid_rows_are_reported(self):
+        path = self.write_file(".jsonl", "\n".join([
+         '{"project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 08:00"}',
+         '{"project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00", "breaks": 60}',
+         '{"project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00", "breaks": -1}',
+         '{"project": "AAA", "start": "June", "end": "2008-06-01 10:00"}',
+         '{"project": "", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00"}',
+         '{"user": "tom", "project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00"}',
+         '{"project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00", "timezone": "Mars"}',
+         '[1, 2',
+         '{"project": "AAA", "start": "2008-06-01 09:00", "end": "2008-06-01 10:00"}',
+        ]))
+        out = StringIO()
+        call_command("import_sessions", path, user="sam", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[:8], [
+         "Line 1 rejected: End time is before start time",
+         "Line 2 rejected: Break cannot cancel out session",
+         "Line 3 rejected: The break must be positive.",
+         "Line 4 rejected: Invalid start time",
+         "Line 5 rejected: Invalid project name",
+         "Line 6 rejected: No such user",
+         "Line 7 rejected: Unknown timezone",
+         "Line 8 rejected: Not a JSON object",
+        ])
+        self.assertIn("Imported 1 session, rejected 8", lines[8])
+        self.assertEqual(Session.objects.count(), 1)
+
+
+    def test_bad_arguments_are_rejected(self):
+        path = self.write_file(".csv", "project,start,end\n")
+        with self.assertRaises(CommandError):
+            call_command("import_sessions", path, user="tom", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("import_sessions", path + "x", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command(
+             "import_sessions", path, batch_size=0, stdout=StringIO()
+            )
+
+
+
+class ExportSessionsTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User, username="sam", timezone=pytz.UTC)
+        self.project = Project.objects.create(name="AAA", user=self.user)
+        Session.objects.create(
+         start=datetime(2008, 6, 1, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 6, 1, 10, 0, tzinfo=pytz.UTC), breaks=5,
+         project=self.project, timezone=pytz.timezone("Europe/London"),
+         notes="Say \"hi\", then go"
+        )
+        Session.objects.create(
+         start=datetime(2008, 6, 3, 9, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 6, 3, 9, 30, tzinfo=pytz.UTC),
+         project=Project.objects.create(name="BBB", user=self.user),
+         timezone=pytz.UTC
+        )
+
+
+    def test_can_export_csv_in_session_timezones(self):
+        out = StringIO()
+        call_command("export_sessions", "sam", stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+         "project,start,end,breaks,minutes,timezone,notes",
+         'AAA,2008-06-01T10:00:00+01:00,2008-06-01T11:00:00+01:00,5,55,'
+         'Europe/London,"Say ""hi"", then go"',
+         "BBB,2008-06-03T09:00:00+00:00,2008-06-03T09:30:00+00:00,0,30,UTC,"
+        ])
+
+
+    def test_can_export_json_lines_narrowed(self):
+        out = StringIO()
+        call_command(
+         "export_sessions", "sam", format="jsonl", start="2008-06-02",
+         end="2008-06-03", stdout=out
+        )
+        self.assertEqual(out.getvalue(), json.dumps({
+         "project": "BBB", "start": "2008-06-03T09:00:00+00:00",
+         "end": "2008-06-03T09:30:00+00:00", "breaks": 0, "minutes": 30,
+         "timezone": "UTC", "notes": ""
+        }) + "\n")
+        out = StringIO()
+        call_command(
+         "export_sessions", "sam", format="jsonl", project="AAA", stdout=out
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+
+    def test_exports_can_be_imported_again(self):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command("export_sessions", "sam", output=path)
+        mixer.blend(User, username="bob")
+        call_command("import_sessions", path, user="bob", stdout=StringIO())
+        self.assertEqual(
+         sorted(Session.objects.filter(user__username="bob").values_list(
+          "project__name", "start", "breaks", "notes"
+         )), sorted(Session.objects.filter(user=self.user).values_list(
+          "project__name", "start", "breaks", "notes"
+         ))
+        )
+
+
+    def test_bad_arguments_are_rejected(self):
+        for args, kwargs in (
+         (["tom"], {}), (["sam"], {"project": "CCC"}),
+         (["sam"], {"start": "June"}), (["sam"], {"end": "9999-12-31"})
+        ):
+            with self.assertRaises(CommandError):
+                call_command("export_sessions", *args, stdout=StringIO(), **kwargs)
+
+
+
+class GenerateLoadDataTests(DjangoTest):
+
+    def test_can_generate_users_projects_and_sessions(self):
+        out = StringIO()
+        call_command(
+         "generate_load_data", users=3, projects=4, sessions=50, batch_size=40,
+         stdout=out
+        )
+        self.assertIn("Created 3 users, 12 projects and 150 sessions", out.getvalue())
+        users = User.objects.filter(username__startswith="load-")
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(len({str(user.timezone) for user in users}), 3)
+        for user in users:
+            self.assertEqual(Project.objects.filter(user=user).count(), 4)
+            self.assertEqual(Session.objects.filter(user=user).count(), 50)
+            self.assertEqual(
+             user.total_time(), Session.objects.filter(user=user).total_duration()
+            )
+        for session in Session.objects.all():
+            self.assertIsNone(check_session_times(
+             session.start, session.end, session.breaks
+            ))
+
+
+    def test_same_seed_makes_same_data(self):
+        call_command("generate_load_data", users=1, sessions=20, stdout=StringIO())
+        call_command(
+         "generate_load_data", users=1, sessions=20, prefix="other-",
+         stdout=StringIO()
+        )
+        self.assertEqual(*[list(Session.objects.filter(
+         user__username=username
+        ).order_by("id").values_list("start", "end", "breaks", "project__name"))
+         for username in ("load-1", "other-1")])
+
+
+    def test_existing_users_are_not_overwritten(self):
+        mixer.blend(User, username="load-2")
+        with self.assertRaises(CommandError):
+            call_command("generate_load_data", users=3, stdout=StringIO())
+        self.assertEqual(Session.objects.count(), 0)
@@ -1,9 +1,12 @@
 from datetime import datetime, time, date
 from unittest.mock import patch, Mock
+import pytz
 from testarsenal import DjangoTest
 from mixer.backend.django import mixer
 from django.core.exceptions import ValidationError
 from django.forms.widgets import MultiWidget, Widget
+from django.test import RequestFactory
+from core.models import User
 from projects.forms import *
 
 class ProjectFormTests(DjangoTest):
@@ -261,16 +264,66 @@ class SessionFormTests(DjangoTest):
 
 
 
+class ProjectResolverTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User)
+        self.project = Project.objects.create(user=self.user, name="AAA")
+        self.resolver = ProjectResolver(self.user)
+
+
+    def test_projects_are_looked_up_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolver.get(" AAA"), self.project)
+            self.assertEqual(self.resolver.get("AAA"), self.project)
+            self.assertEqual(self.resolver.get_or_create("AAA"), self.project)
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.resolver.get("BBB"))
+            self.assertIsNone(self.resolver.get("BBB"))
+            self.assertIsNone(self.resolver.get("   "))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.resolver.get_by_id(self.project.id), self.project)
+            self.assertEqual(self.resolver.get_by_id(self.project.id), self.project)
+
+
+    def test_projects_are_created_once(self):
+        project = self.resolver.get_or_create("BBB ")
+        self.assertEqual(project.name, "BBB")
+        self.assertEqual(project.user, self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.get_or_create("BBB"), project)
+            self.assertEqual(self.resolver.get("BBB"), project)
+
+
+    def test_invalid_names_are_not_created(self):
+        for name in (None, "", "   ", "a\x00b", "x" * 256):
+            self.assertIsNone(self.resolver.get_or_create(name))
+        self.assertEqual(Project.objects.count(), 1)
+
+
+    def test_projects_created_elsewhere_are_found(self):
+        self.resolver.get("BBB")
+        other = Project.objects.create(user=self.user, name="BBB")
+        self.assertEqual(ProjectResolver(self.user).get_or_create("BBB"), other)
+        self.resolver.by_name.pop("BBB")
+        with patch("projects.forms.ProjectResolver.get") as mock_get:
+            mock_get.return_value = None
+            self.assertEqual(self.resolver.get_or_create("BBB"), other)
+        self.assertEqual(Project.objects.filter(name="BBB").count(), 1)
+
+
+
 class SessionFormPostDataProcessingTests(DjangoTest):
 
     def setUp(self):
-        self.patch1 = patch("projects.forms.ProjectForm")
+        self.patch1 = patch("projects.forms.ProjectResolver")
         self.patch2 = patch("projects.forms.SessionForm")
-        self.mock_project_form = self.patch1.start()
+        self.mock_resolver = self.patch1.start()
         self.mock_session_form = self.patch2.start()
-        self.mock_project_form.return_value = Mock()
         self.mock_session_form.return_value = "SESSIONFORM"
-        self.request = self.make_request("---", loggedin=True)
+        self.request = self.make_request(
+         "---", method="post", data={"project": "AAA"}, loggedin=True
+        )
 
 
     def tearDown(self):
@@ -278,26 +331,32 @@ class SessionFormPostDataProcessingTests(DjangoTest):
         self.patch2.stop()
 
 
-    def test_can_process_session_post_data_with_new_project(self):
+    def test_can_process_session_post_data(self):
         form = process_session_form_data(
          self.request, date=date(2001, 9, 11), instance="I"
         )
         self.assertEqual(form, "SESSIONFORM")
-        self.mock_project_form.assert_called_with(self.request.user, self.request.POST)
-        self.mock_project_form.return_value.save.assert_called_with()
+        self.mock_resolver.assert_called_with(self.request.user)
+        self.mock_resolver.return_value.get_or_create.assert_called_with("AAA")
         self.mock_session_form.assert_called_with(
-         self.request.POST, user=self.request.user, date=date(2001, 9, 11), instance="I"
+         self.request.POST, user=self.request.user, date=date(2001, 9, 11),
+         instance="I", projects=self.mock_resolver.return_value
         )
 
 
-    def test_can_process_session_post_data_with_existing_project(self):
-        self.mock_project_form.return_value.save.side_effect = Exception
-        form = process_session_form_data(
-         self.request, date=date(2001, 9, 11), instance="I"
-        )
-        self.assertEqual(form, "SESSIONFORM")
-        self.mock_project_form.assert_called_with(self.request.user, self.request.POST)
-        self.mock_project_form.return_value.save.assert_called_with()
-        self.mock_session_form.assert_called_with(
-         self.request.POST, user=self.request.user, date=date(2001, 9, 11), instance="I"
-        )
+
+class SessionSubmissionQueryTests(DjangoTest):
+
+    def test_session_submission_looks_project_up_once(self):
+        user = mixer.blend(User, timezone=pytz.UTC)
+        project = Project.objects.create(user=user, name="AAA")
+        request = RequestFactory().post("/", data={
+         "start_0": "2018-01-02", "start_1": "12:00", "end_0": "2018-01-02",
+         "end_1": "13:00", "project": "AAA"
+        })
+        request.user = user
+        with self.assertNumQueries(2):
+            form = process_session_form_data(request)
+            self.assertTrue(form.is_valid())
+            self.assertEqual(form.cleaned_data["project"], project)
+            form["project"].as_widget()
@@ -1,4 +1,4 @@
-from datetime import datetime, time, date
+from datetime import datetime, time, date, timedelta
 import pytz
 from mixer.backend.django import mixer
 from unittest.mock import Mock, patch
@@ -56,15 +56,87 @@ class ProjectTests(DjangoTest):
         self.assertEqual(projects[3], project3)
 
 
-    @patch("projects.models.Project.session_set")
-    def test_total_project_time(self, mock_set):
-        mock_set.all.return_value = [Mock(), Mock(), Mock()]
-        mock_set.all.return_value[0].duration.return_value = 10
-        mock_set.all.return_value[1].duration.return_value = 20
-        mock_set.all.return_value[2].duration.return_value = 19
+    def test_changing_project_user_moves_sessions(self):
         project = Project.objects.create(name="AAA", user=self.user)
-        self.assertEqual(project.total_time(), 49)
-        mock_set.all.assert_called_with()
+        session = mixer.blend(Session, project=project)
+        user2 = mixer.blend(User)
+        project.user = user2
+        project.save()
+        session.refresh_from_db()
+        self.assertEqual(session.user, user2)
+
+
+    def test_total_project_time(self):
+        project = Project.objects.create(name="AAA", user=self.user)
+        other = Project.objects.create(name="BBB", user=self.user)
+        for i, p in enumerate([project, project, project, other]):
+            Session.objects.create(
+             start=datetime(2008, 1, 1, 9, 0, 0, tzinfo=pytz.UTC),
+             end=datetime(2008, 1, 1, 9, 10 * (i + 1), 0, tzinfo=pytz.UTC),
+             breaks=i, project=p, timezone=AUCK
+            )
+        project.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(project.total_time(), 57)
+
+
+    def test_project_stats_follow_session_changes(self):
+        project = Project.objects.create(name="AAA", user=self.user)
+        other = Project.objects.create(name="BBB", user=self.user)
+        sessions = [Session.objects.create(
+         start=datetime(2008, 1, day, 9, 0, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, day, 10, 0, 0, tzinfo=pytz.UTC),
+         breaks=day, project=project, timezone=AUCK
+        ) for day in (1, 2, 3)]
+        project.refresh_from_db()
+        self.assertEqual(project.total_minutes, 174)
+        self.assertEqual(project.session_count, 3)
+        self.assertEqual(project.first_start, sessions[0].start)
+        self.assertEqual(project.last_end, sessions[2].end)
+        session = Session.objects.get(id=sessions[0].id)
+        session.project = other
+        session.save()
+        Session.objects.get(id=sessions[2].id).delete()
+        project.refresh_from_db(), other.refresh_from_db()
+        self.assertEqual(project.total_minutes, 58)
+        self.assertEqual(project.session_count, 1)
+        self.assertEqual(project.first_start, sessions[1].start)
+        self.assertEqual(project.last_end, sessions[1].end)
+        self.assertEqual(other.total_minutes, 59)
+        self.assertEqual(other.session_count, 1)
+        Session.objects.get(id=sessions[1].id).delete()
+        project.refresh_from_db()
+        self.assertEqual(project.total_minutes, 0)
+        self.assertEqual(project.session_count, 0)
+        self.assertIsNone(project.first_start)
+        self.assertIsNone(project.last_end)
+
+
+    def test_project_stats_survive_bulk_operations(self):
+        project = Project.objects.create(name="AAA", user=self.user)
+        other = Project.objects.create(name="BBB", user=self.user)
+        Session.objects.bulk_create([Session(
+         start=datetime(2008, 1, day, 9, 0, 0, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, day, 10, 0, 0, tzinfo=pytz.UTC),
+         project=project, timezone=AUCK
+        ) for day in (1, 2, 3)])
+        project.refresh_from_db()
+        self.assertEqual(project.total_minutes, 180)
+        self.assertEqual(project.session_count, 3)
+        Session.objects.filter(start__day=1).update(project=other)
+        Session.objects.filter(start__day=2).update(breaks=10)
+        Session.objects.filter(start__day=3).delete()
+        project.refresh_from_db(), other.refresh_from_db()
+        self.assertEqual(project.total_minutes, 50)
+        self.assertEqual(project.session_count, 1)
+        self.assertEqual(project.last_end.day, 2)
+        self.assertEqual(other.total_minutes, 60)
+        self.assertEqual(other.first_start.day, 1)
+
+
+    def test_total_project_time_with_no_sessions(self):
+        project = Project.objects.create(name="AAA", user=self.user)
+        self.assertEqual(project.total_time(), 0)
 
 
     def test_can_get_projects_by_total_duration(self):
@@ -84,10 +156,10 @@ class ProjectTests(DjangoTest):
         self.assertEqual(ordered[1].duration, 49 + 50 - 45)
         self.assertEqual(ordered[2].duration, 45 + 46 - 40)
         self.assertEqual(ordered[3].duration, 51 + 52 - 65)
-        self.assertEqual(ordered[0].recent, sessions[3])
-        self.assertEqual(ordered[1].recent, sessions[5])
-        self.assertEqual(ordered[2].recent, sessions[1])
-        self.assertEqual(ordered[3].recent, sessions[7])
+        self.assertEqual(ordered[0].recent, sessions[3].end)
+        self.assertEqual(ordered[1].recent, sessions[5].end)
+        self.assertEqual(ordered[2].recent, sessions[1].end)
+        self.assertEqual(ordered[3].recent, sessions[7].end)
 
 
     def test_can_get_projects_by_last_done(self):
@@ -104,6 +176,24 @@ class ProjectTests(DjangoTest):
         self.assertEqual(ordered, projects[:5][::-1])
 
 
+    def test_projects_by_last_done_put_unused_projects_last(self):
+        user = mixer.blend(User, project_order="LD")
+        projects = [Project.objects.create(name=str(i), user=user) for i in range(4)]
+        for project, day in ((projects[0], 2), (projects[2], 1)):
+            mixer.blend(
+             Session, project=project, breaks=0,
+             start=datetime(2008, 1, day, 9, 0, 0, tzinfo=pytz.UTC),
+             end=datetime(2008, 1, day, 10, 0, 0, tzinfo=pytz.UTC)
+            )
+        with self.assertNumQueries(1):
+            ordered = list(Project.by_user_order(user))
+        self.assertEqual(
+         ordered, [projects[0], projects[2], projects[1], projects[3]]
+        )
+        self.assertEqual(ordered[2].duration, 0)
+        self.assertIsNone(ordered[2].recent)
+
+
 
 class SessionTests(DjangoTest):
 
@@ -129,6 +219,14 @@ class SessionTests(DjangoTest):
         session.full_clean(), session.save()
 
 
+    def test_session_takes_user_from_project(self):
+        session = Session(
+         start=self.dt1, end=self.dt2, project=self.project, timezone=AUCK
+        )
+        session.save()
+        self.assertEqual(Session.objects.get(id=session.id).user, self.user)
+
+
     def test_default_break_is_0(self):
         session = Session(
          start=self.dt1, end=self.dt2, project=self.project,
@@ -192,6 +290,96 @@ class SessionTests(DjangoTest):
         self.assertEqual(session.duration(), 527065)
 
 
+    def test_database_duration_matches_python_duration(self):
+        utc = pytz.UTC
+        for start, end, breaks in (
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2008, 1, 1, 9, 30, tzinfo=utc), 5),
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2009, 1, 1, 9, 45, tzinfo=utc), 5),
+         (datetime(2008, 1, 1, 9, 15, 20, tzinfo=utc), datetime(2008, 1, 1, 9, 16, tzinfo=utc), 0),
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2008, 1, 1, 9, 15, 30, tzinfo=utc), 1),
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2008, 1, 3, 9, 0, tzinfo=utc), 30),
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2008, 1, 2, 9, 20, tzinfo=utc), 10),
+         (datetime(2008, 1, 1, 9, 15, tzinfo=utc), datetime(2008, 1, 1, 8, 0, tzinfo=utc), 0),
+        ):
+            Session.objects.create(
+             start=start, end=end, breaks=breaks, project=self.project,
+             timezone=AUCK
+            )
+        sessions = Session.objects.with_duration().annotate(sql=SessionMinutes())
+        for session in sessions:
+            self.assertEqual(session.sql, session.duration())
+            self.assertEqual(session.minutes, session.duration())
+        self.assertEqual(
+         Session.objects.total_duration(),
+         sum(s.duration() for s in sessions)
+        )
+
+
+    def test_stored_duration_follows_changes(self):
+        utc = pytz.UTC
+        session = Session.objects.create(
+         start=datetime(2008, 1, 1, 9, 15, tzinfo=utc),
+         end=datetime(2008, 1, 3, 9, 0, tzinfo=utc), breaks=30,
+         project=self.project, timezone=AUCK
+        )
+        self.assertEqual(session.duration_minutes, 2835)
+        session.breaks = 0
+        session.save()
+        session.refresh_from_db()
+        self.assertEqual(session.duration_minutes, 2865)
+        Session.objects.filter(id=session.id).update(
+         end=datetime(2008, 1, 1, 10, 15, tzinfo=utc)
+        )
+        session.refresh_from_db()
+        self.assertEqual(session.duration_minutes, 60)
+        Session.objects.filter(id=session.id).update(breaks=F("breaks") + 10)
+        session.refresh_from_db()
+        self.assertEqual(session.duration_minutes, 50)
+        Session.objects.bulk_create([Session(
+         start=datetime(2008, 1, 1, 9, 15, tzinfo=utc),
+         end=datetime(2008, 1, 2, 9, 20, tzinfo=utc), breaks=10,
+         project=self.project, timezone=AUCK
+        )])
+        self.assertEqual(
+         Session.objects.get(breaks=10, end__day=2).duration_minutes, 1435
+        )
+
+
+    def test_sessions_can_be_inserted_in_batches(self):
+        sessions = (Session(
+         start=datetime(2008, 1, n, 9, tzinfo=pytz.UTC),
+         end=datetime(2008, 1, n, 10, tzinfo=pytz.UTC), breaks=0,
+         project=self.project, timezone=AUCK
+        ) for n in range(1, 6))
+        self.assertEqual(Session.objects.bulk_insert(sessions, 2), 5)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.session_count, 5)
+        self.assertEqual(self.project.total_minutes, 300)
+        self.assertEqual(
+         set(DayTotal.objects.values_list("date", "minutes")),
+         {(date(2008, 1, n), 60) for n in range(1, 6)}
+        )
+
+
+    def test_database_duration_of_given_values(self):
+        start = datetime(2008, 1, 1, 9, 15, tzinfo=pytz.UTC)
+        end = datetime(2008, 1, 3, 8, 0, tzinfo=pytz.UTC)
+        Session.objects.create(
+         start=start, end=start, project=self.project, timezone=AUCK
+        )
+        session = Session.objects.annotate(sql=SessionMinutes(*[
+         Value(value, output_field=Session._meta.get_field(name))
+         for name, value in (("start", start), ("end", end), ("breaks", 10))
+        ])).get()
+        self.assertEqual(
+         session.sql, Session(start=start, end=end, breaks=10).duration()
+        )
+
+
+    def test_total_duration_of_no_sessions_is_zero(self):
+        self.assertEqual(Session.objects.total_duration(), 0)
+
+
     @patch("projects.models.Day")
     def test_can_get_sessions_from_day(self, mock_day):
         mock_day.return_value = "DAY"
@@ -211,11 +399,132 @@ class SessionTests(DjangoTest):
         self.assertEqual(
          list(mock_day.call_args_list[1][0][0]), list(Session.objects.filter(id=2))
         )
-        with tz.override(AUCK):
-            sessions = Session.from_day(self.user, date(2007, 1, 10))
-            self.assertEqual(
-             list(mock_day.call_args_list[2][0][0]), list(Session.objects.all())
+        self.user.timezone = AUCK
+        sessions = Session.from_day(self.user, date(2007, 1, 10))
+        self.assertEqual(
+         list(mock_day.call_args_list[2][0][0]), list(Session.objects.all())
+        )
+
+
+    def test_sessions_from_day_include_local_midnight_only_once(self):
+        self.user.timezone = AUCK
+        for hour in (0, 24):
+            Session.objects.create(
+             start=AUCK.localize(datetime(2007, 1, 10)) + timedelta(hours=hour),
+             end=self.dt3, project=self.project, timezone=AUCK
             )
+        day = Session.from_day(self.user, date(2007, 1, 10))
+        self.assertEqual(day.sessions, [Session.objects.get(id=1)])
+        day = Session.from_day(self.user, date(2007, 1, 11))
+        self.assertEqual(day.sessions, [Session.objects.get(id=2)])
+
+
+
+class LocalDayBoundsTests(DjangoTest):
+
+    def test_ordinary_day(self):
+        start, end = local_day_bounds(date(2007, 6, 10), AUCK)
+        self.assertEqual(start, datetime(2007, 6, 9, 12, 0, tzinfo=pytz.UTC))
+        self.assertEqual(end, datetime(2007, 6, 10, 12, 0, tzinfo=pytz.UTC))
+
+
+    def test_clocks_going_forward(self):
+        start, end = local_day_bounds(date(2007, 9, 30), AUCK)
+        self.assertEqual(start, datetime(2007, 9, 29, 12, 0, tzinfo=pytz.UTC))
+        self.assertEqual(end - start, timedelta(hours=23))
+
+
+    def test_clocks_going_back(self):
+        start, end = local_day_bounds(date(2008, 4, 6), AUCK)
+        self.assertEqual(start, datetime(2008, 4, 5, 11, 0, tzinfo=pytz.UTC))
+        self.assertEqual(end - start, timedelta(hours=25))
+
+
+    def test_skipped_midnight(self):
+        sao_paulo = pytz.timezone("America/Sao_Paulo")
+        start, end = local_day_bounds(date(2017, 10, 15), sao_paulo)
+        self.assertEqual(start, datetime(2017, 10, 15, 3, 0, tzinfo=pytz.UTC))
+        self.assertEqual(end - start, timedelta(hours=23))
+
+
+
+class DayTotalTests(DjangoTest):
+
+    def setUp(self):
+        self.user = mixer.blend(User, timezone=AUCK)
+        self.project = mixer.blend(Project, user=self.user)
+        self.other = mixer.blend(Project, user=self.user)
+
+
+    def make_session(self, day, hour, project=None):
+        return Session.objects.create(
+         start=pytz.UTC.localize(datetime(2008, 1, day, hour)),
+         end=pytz.UTC.localize(datetime(2008, 1, day, hour, 30)),
+         project=project or self.project, timezone=AUCK
+        )
+
+
+    def totals(self):
+        return set(DayTotal.objects.filter(session_count__gt=0).values_list(
+         "project", "date", "minutes", "session_count"
+        ))
+
+
+    def test_sessions_are_added_to_local_days(self):
+        self.make_session(1, 9), self.make_session(1, 10)
+        self.make_session(1, 12), self.make_session(2, 10, self.other)
+        self.assertEqual(self.totals(), {
+         (self.project.id, date(2008, 1, 1), 60, 2),
+         (self.project.id, date(2008, 1, 2), 30, 1),
+         (self.other.id, date(2008, 1, 2), 30, 1),
+        })
+
+
+    def test_edited_and_deleted_sessions_move_between_totals(self):
+        session = self.make_session(1, 9)
+        self.make_session(1, 10)
+        session = Session.objects.get(id=session.id)
+        session.project = self.other
+        session.start = pytz.UTC.localize(datetime(2008, 1, 1, 8))
+        session.save()
+        self.assertEqual(self.totals(), {
+         (self.project.id, date(2008, 1, 1), 30, 1),
+         (self.other.id, date(2008, 1, 1), 90, 1),
+        })
+        Session.objects.get(id=session.id).delete()
+        self.assertEqual(self.totals(), {(self.project.id, date(2008, 1, 1), 30, 1)})
+
+
+    def test_can_rebuild_totals_in_new_timezone(self):
+        self.make_session(1, 9), self.make_session(1, 12)
+        self.user.timezone = pytz.UTC
+        self.user.save()
+        DayTotal.objects.rebuild(self.user)
+        self.assertEqual(self.totals(), {(self.project.id, date(2008, 1, 1), 60, 2)})
+
+
+    def test_bulk_operations_rebuild_totals(self):
+        Session.objects.bulk_create([Session(
+         start=pytz.UTC.localize(datetime(2008, 1, 1, hour)),
+         end=pytz.UTC.localize(datetime(2008, 1, 1, hour, 30)),
+         project=self.project, timezone=AUCK
+        ) for hour in (9, 12)])
+        self.assertEqual(self.totals(), {
+         (self.project.id, date(2008, 1, 1), 30, 1),
+         (self.project.id, date(2008, 1, 2), 30, 1),
+        })
+        Session.objects.filter(start__hour=9).update(project=self.other)
+        Session.objects.filter(start__hour=12).delete()
+        self.assertEqual(self.totals(), {(self.other.id, date(2008, 1, 1), 30, 1)})
+
+
+    def test_totals_grouped_by_date(self):
+        self.make_session(1, 9), self.make_session(1, 12)
+        self.make_session(2, 10, self.other)
+        self.assertEqual(list(DayTotal.objects.filter(user=self.user).by_date()), [
+         {"date": date(2008, 1, 1), "total_minutes": 30, "sessions": 1},
+         {"date": date(2008, 1, 2), "total_minutes": 60, "sessions": 2},
+        ])
 
 
 
@@ -224,7 +533,7 @@ class DayTests(DjangoTest):
     def setUp(self):
         self.sessions = [Mock() for _ in range(10)]
         for i, session in enumerate(self.sessions):
-            session.duration.return_value = i + 1
+            session.duration_minutes = i + 1
 
 
     def test_day_creation_tests(self):
@@ -234,6 +543,11 @@ class DayTests(DjangoTest):
         self.assertEqual(day.total_duration, 55)
 
 
+    def test_day_can_be_given_total(self):
+        day = Day(self.sessions, day=date(1996, 3, 4), total_duration=12)
+        self.assertEqual(day.total_duration, 12)
+
+
     def test_day_iteration(self):
         day = Day(self.sessions, day=date(1996, 3, 4))
         self.assertEqual(list(day), self.sessions)
@@ -278,6 +592,43 @@ class DayTests(DjangoTest):
         )
 
 
+    def test_session_pages_keep_days_whole(self):
+        user = mixer.blend(User, timezone=AUCK)
+        project = mixer.blend(Project, user=user)
+        sessions = [Session.objects.create(
+         start=AUCK.localize(datetime(2008, 1, day, hour)),
+         end=AUCK.localize(datetime(2008, 1, day, hour, 30)),
+         project=project, timezone=AUCK
+        ) for day, hour in (
+         (1, 9), (1, 10), (2, 9), (3, 9), (3, 10), (3, 11), (4, 9)
+        )]
+        all_sessions = Session.objects.filter(project=project)
+        with tz.override(AUCK):
+            days, older, newer = Day.page(all_sessions, 2)
+            self.assertEqual([d.day.day for d in days], [4, 3])
+            self.assertEqual(days[1].sessions, sessions[3:6])
+            self.assertEqual(older, sessions[3].cursor())
+            self.assertIsNone(newer)
+            days, older, newer = Day.page(all_sessions, 2, before=older)
+            self.assertEqual([d.day.day for d in days], [2, 1])
+            self.assertIsNone(older)
+            self.assertEqual(newer, sessions[2].cursor())
+            days, older, newer = Day.page(all_sessions, 2, after=newer)
+            self.assertEqual([d.day.day for d in days], [3])
+            self.assertEqual(older, sessions[3].cursor())
+            self.assertEqual(newer, sessions[5].cursor())
+
+
+    def test_session_cursors(self):
+        session = Session(start=AUCK.localize(datetime(2008, 1, 1, 9, 0, 5, 7)), id=4)
+        self.assertEqual(session.cursor(), "20071231200005000007-4")
+        self.assertEqual(
+         Session.parse_cursor(session.cursor()), (session.start, 4)
+        )
+        with self.assertRaises(ValueError):
+            Session.parse_cursor("2007-4-4")
+
+
     @patch("projects.models.Day")
     def test_day_grouping(self, mock_day):
         mock_days = [Mock(day=i) for i in range(4)]
@@ -296,6 +647,55 @@ class DayTests(DjangoTest):
         mock_day.assert_any_call([s6], day=date(1978, 2, 6))
 
 
+    def test_sessions_grouped_by_local_date_in_database(self):
+        user = mixer.blend(User, timezone=AUCK)
+        project = mixer.blend(Project, user=user)
+        s1, s2, s3, s4 = [Session.objects.create(
+         start=AUCK.localize(start), end=AUCK.localize(start) + timedelta(hours=1),
+         breaks=breaks, project=project, timezone=AUCK
+        ) for start, breaks in (
+         (datetime(1978, 2, 4, 8), 0), (datetime(1978, 2, 5, 23, 30), 10),
+         (datetime(1978, 2, 5, 0, 30), 5), (datetime(1978, 2, 6, 12), 0)
+        )]
+        with tz.override(AUCK):
+            with self.assertNumQueries(2):
+                days = Session.objects.filter(user=user).group_by_local_date()
+        self.assertEqual(
+         [d.day for d in days], [date(1978, 2, d) for d in (6, 5, 4)]
+        )
+        self.assertEqual([d.sessions for d in days], [[s4], [s3, s2], [s1]])
+        self.assertEqual([d.total_duration for d in days], [60, 105, 60])
+        with tz.override(pytz.UTC):
+            days = Session.objects.filter(user=user).group_by_local_date()
+        self.assertEqual(
+         [d.day for d in days], [date(1978, 2, d) for d in (5, 4, 3)]
+        )
+
+
+    def test_calendar_fills_range(self):
+        days = [Day([], day=date(1986, 2, i)) for i in (2, 4)]
+        days.append(Day([], day=date(1986, 4, 1)))
+        calendar = Day.calendar(days, date(1986, 1, 30), date(1986, 3, 2))
+        self.assertEqual(len(calendar), 32)
+        self.assertEqual(calendar[0].day, date(1986, 1, 30))
+        self.assertEqual(calendar[-1].day, date(1986, 3, 2))
+        self.assertIs(calendar[3], days[0])
+        self.assertIs(calendar[5], days[1])
+        self.assertEqual(calendar[4].sessions, [])
+
+
+    def test_calendar_can_be_empty(self):
+        self.assertEqual(Day.calendar([], date(1986, 2, 2), date(1986, 2, 1)), [])
+
+
+    @patch("projects.models.tz.localtime")
+    def test_day_insertion_in_future_month(self, mock_local):
+        mock_local.return_value = datetime(1986, 1, 11)
+        days = []
+        Day.insert_empty_month_days(days, 1986, 2)
+        self.assertEqual(days, [])
+
+
     @patch("projects.models.Day")
     def test_day_insertion(self, mock_day):
         mock_day.side_effect = lambda s, **d: Mock(day=d["day"])
@@ -0,0 +1,50 @@
+from core.tests.test_query_budgets import QueryBudgetTest, SESSION
+
+BUDGETS = {
+ "time/<int:year>/": [("get", "/time/2017/", None, 3)],
+ "time/<slug:month>/": [("get", "/time/2017-06/", None, 4)],
+ "projects/new/": [
+  ("get", "/projects/new/", None, 2),
+  ("post", "/projects/new/", {"name": "Project X"}, 4)
+ ],
+ "projects/<slug:project>/": [("get", "/projects/{project}/", None, 4)],
+ "projects/<slug:project>/edit/": [
+  ("get", "/projects/{project}/edit/", None, 3),
+  ("post", "/projects/{project}/edit/", {"name": "Project Y"}, 6)
+ ],
+ "projects/<slug:project>/delete/": [
+  ("get", "/projects/{project}/delete/", None, 4)
+ ],
+ "sessions/<slug:session>/edit/": [
+  ("get", "/sessions/{session}/edit/", None, 4),
+  ("post", "/sessions/{session}/edit/", SESSION, 14)
+ ],
+ "sessions/<slug:session>/delete/": [
+  ("get", "/sessions/{session}/delete/", None, 4),
+  ("post", "/sessions/{session}/delete/", None, 8)
+ ],
+ "projects/": [("get", "/projects/", None, 3)],
+ "export/": [
+  ("get", "/export/", None, 3), ("get", "/export/?format=jsonl", None, 3)
+ ],
+ "api/v1/sessions/": [
+  ("get", "/api/v1/sessions/", None, 3),
+  ("get", "/api/v1/sessions/?limit=1000", None, 3),
+  ("post", "/api/v1/sessions/", {"sessions": [{
+   "project": "Project 3", "start": "2019-03-04 09:00",
+   "end": "2019-03-04 10:00", "breaks": 0
+  }] * 5}, 20)
+ ],
+ "api/v1/projects/": [("get", "/api/v1/projects/", None, 3)],
+ "api/v1/projects/suggest/": [
+  ("get", "/api/v1/projects/suggest/?q=proj", None, 3)
+ ],
+ "api/v1/projects/<int:project>/": [
+  ("get", "/api/v1/projects/{project}/", None, 3)
+ ]
+}
+
+class ProjectQueryBudgetTests(QueryBudgetTest):
+
+    def test_urls_are_within_budget(self):
+        self.assertWithinBudgets(BUDGETS)
@@ -30,17 +30,75 @@ class MonthViewTests(DjangoTest):
 
 
 
+class YearViewTests(DjangoTest):
+
+    def setUp(self):
+        self.patch1 = patch("projects.views.DayTotal.objects.filter")
+        self.mock_filter = self.patch1.start()
+        self.mock_filter.return_value.by_date.return_value = [
+         {"date": date(2017, 1, 4), "total_minutes": 30, "sessions": 1},
+         {"date": date(2017, 1, 9), "total_minutes": 60, "sessions": 2},
+         {"date": date(2017, 3, 2), "total_minutes": 15, "sessions": 1},
+        ]
+        self.request = self.make_request("---", loggedin=True)
+        self.request.now = datetime(2017, 4, 10)
+
+
+    def tearDown(self):
+        self.patch1.stop()
+
+
+    def test_year_view_uses_year_template(self):
+        self.check_view_uses_template(year, self.request, "year.html", 2017)
+
+
+    def test_year_view_requires_auth(self):
+        request = self.make_request("---")
+        self.check_view_redirects(year, request, "/", 2017)
+
+
+    def test_year_view_sends_month_totals(self):
+        self.check_view_has_context(year, self.request, {"year": 2017, "months": [
+         {"date": date(2017, 1, 1), "minutes": 90, "days": 2},
+         {"date": date(2017, 2, 1), "minutes": 0, "days": 0},
+         {"date": date(2017, 3, 1), "minutes": 15, "days": 1},
+         {"date": date(2017, 4, 1), "minutes": 0, "days": 0},
+        ], "total": 105}, 2017)
+        self.mock_filter.assert_called_with(user=self.request.user, date__year=2017)
+
+
+    def test_year_view_sends_future_months_with_sessions(self):
+        self.mock_filter.return_value.by_date.return_value.append(
+         {"date": date(2017, 6, 20), "total_minutes": 45, "sessions": 1}
+        )
+        self.check_view_has_context(year, self.request, {"months": [
+         {"date": date(2017, 1, 1), "minutes": 90, "days": 2},
+         {"date": date(2017, 2, 1), "minutes": 0, "days": 0},
+         {"date": date(2017, 3, 1), "minutes": 15, "days": 1},
+         {"date": date(2017, 4, 1), "minutes": 0, "days": 0},
+         {"date": date(2017, 6, 1), "minutes": 45, "days": 1},
+        ], "total": 150}, 2017)
+
+
+    def test_year_view_rejects_impossible_years(self):
+        for year_number in (0, 2018, 10000):
+            with self.assertRaises(Http404):
+                year(self.request, year_number)
+
+
+
 class TimeViewTests(DjangoTest):
 
     def setUp(self):
         self.patch1 = patch("projects.views.Session.objects.filter")
         self.mock_filter = self.patch1.start()
-        self.patch2 = patch("projects.views.Day.group_sessions_by_local_date")
-        self.mock_group = self.patch2.start()
         self.patch3 = patch("projects.views.get_object_or_404")
         self.mock_get = self.patch3.start()
         self.patch4 = patch("projects.views.Day.insert_empty_month_days")
         self.mock_insert = self.patch4.start()
+        self.patch5 = patch("projects.views.Day.page")
+        self.mock_page = self.patch5.start()
+        self.mock_page.return_value = (["DAY"], "OLD", "NEW")
         self.request = self.make_request("---", loggedin=True)
         self.filtered = Mock()
         self.annotated = Mock()
@@ -50,9 +108,9 @@ class TimeViewTests(DjangoTest):
 
     def tearDown(self):
         self.patch1.stop()
-        self.patch2.stop()
         self.patch3.stop()
         self.patch4.stop()
+        self.patch5.stop()
 
 
     def test_times_view_uses_time_template(self):
@@ -62,6 +120,31 @@ class TimeViewTests(DjangoTest):
     def test_projects_view_requires_auth(self):
         request = self.make_request("---")
         self.check_view_redirects(time, request, "/")
+
+
+    def test_time_view_sends_page_of_days(self):
+        request = self.make_request("---", data={"before": "C"}, loggedin=True)
+        self.check_view_has_context(time, request, {
+         "days": ["DAY"], "older": "OLD", "newer": "NEW"
+        })
+        self.mock_page.assert_called_with(
+         self.annotated, PAGE_SIZE, before="C", after=None
+        )
+
+
+    def test_time_view_rejects_invalid_cursor(self):
+        self.mock_page.side_effect = ValueError
+        with self.assertRaises(Http404):
+            time(self.request)
+
+
+    def test_month_time_view_is_not_paged(self):
+        self.annotated.group_by_local_date.return_value = ["DAY"]
+        self.check_view_has_context(time, self.request, {
+         "days": ["DAY"], "older": None, "newer": None
+        }, None, None, None, datetime(2017, 3, 1))
+        self.assertFalse(self.mock_page.called)
+        self.mock_insert.assert_called_with(["DAY"], 2017, 3)
         
 
 
@@ -95,6 +178,65 @@ class ProjectsViewTests(DjangoTest):
 
 
 
+class ExportViewTests(DjangoTest):
+
+    def setUp(self):
+        self.request = self.make_request("---", loggedin=True)
+        self.patch1 = patch("projects.views.sessions_to_export")
+        self.mock_sessions = self.patch1.start()
+        self.patch2 = patch("projects.views.export_lines")
+        self.mock_lines = self.patch2.start()
+        self.mock_lines.return_value = iter(["A\n", "B\n"])
+
+
+    def tearDown(self):
+        self.patch1.stop()
+        self.patch2.stop()
+
+
+    def test_export_view_streams_csv(self):
+        response = export(self.request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="sessions.csv"', response["Content-Disposition"])
+        self.assertEqual(b"".join(response.streaming_content), b"A\nB\n")
+        self.mock_sessions.assert_called_with(
+         self.request.user, project=None, start=None, end=None
+        )
+        self.mock_lines.assert_called_with(self.mock_sessions.return_value, "csv")
+
+
+    @patch("projects.views.get_object_or_404")
+    def test_export_view_can_be_narrowed(self, mock_get):
+        request = self.make_request("---", loggedin=True, data={
+         "format": "jsonl", "project": "3", "start": "2018-01-01",
+         "end": "2018-01-31"
+        })
+        response = export(request)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        mock_get.assert_called_with(Project, id=3, user=request.user)
+        self.mock_sessions.assert_called_with(
+         request.user, project=mock_get.return_value,
+         start=date(2018, 1, 1), end=date(2018, 1, 31)
+        )
+        self.mock_lines.assert_called_with(self.mock_sessions.return_value, "jsonl")
+
+
+    def test_export_view_rejects_bad_parameters(self):
+        for data in (
+         {"format": "xml"}, {"start": "2018"}, {"project": "A"},
+         {"end": "9999-12-31"}
+        ):
+            with self.assertRaises(Http404):
+                export(self.make_request("---", loggedin=True, data=data))
+
+
+    def test_export_view_requires_auth(self):
+        request = self.make_request("---")
+        self.check_view_redirects(export, request, "/")
+
+
+
 class EditSessionViewTests(DjangoTest):
 
     def setUp(self):
@@ -130,7 +272,7 @@ class EditSessionViewTests(DjangoTest):
         self.check_view_has_context(
          edit_session, self.request, {"form": "FORM"}, 3
         )
-        self.mock_get.assert_called_with(Session, id=3, project__user=self.request.user)
+        self.mock_get.assert_called_with(Session, id=3, user=self.request.user)
         self.mock_form.assert_called_with(instance="SESSION")
 
 
@@ -187,7 +329,7 @@ class DeleteSessionViewTests(DjangoTest):
         self.check_view_has_context(
          delete_session, self.request, {"session": self.session}, 3
         )
-        self.mock_get.assert_called_with(Session, id=3, project__user=self.request.user)
+        self.mock_get.assert_called_with(Session, id=3, user=self.request.user)
 
 
     def test_delete_session_can_delete_session(self):
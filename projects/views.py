@@ -1,13 +1,27 @@
 from datetime import datetime, date, timedelta
 from calendar import monthrange
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import Http404
+from django.http import Http404, StreamingHttpResponse
 from django.db.models import F, ExpressionWrapper
 from django.contrib.auth.decorators import login_required
 from projects.forms import SessionForm, ProjectForm, process_session_form_data
-from projects.models import Session, Project, Day
+from projects.models import Session, Project, Day, DayTotal
+from projects.export import FORMATS, parse_date, sessions_to_export, export_lines
+from core.caching import cached_page, conditional_page
 
+PAGE_SIZE = 100
 
+
+def project_scopes(request, project):
+    """The cache scopes a project page depends on."""
+
+    try:
+        return ["all", "project:{}".format(int(project))]
+    except ValueError: return None
+
+
+@conditional_page
+@cached_page(project_scopes)
 def project(request, project):
     """Returns a view of a project by sending the relevant params to the time
     view."""
@@ -15,6 +29,17 @@ def project(request, project):
     return time(request, project=project)
 
 
+def month_scopes(request, month):
+    """The cache scopes a month page depends on."""
+
+    try:
+        year, month = [int(x) for x in month.split("-")]
+        return ["all", "month:{}".format(date(year, month, 1).strftime("%Y-%m"))]
+    except ValueError: return None
+
+
+@conditional_page
+@cached_page(month_scopes)
 def month(request, month):
     """Returns a view of a month by sending the relevant params to the time
     view."""
@@ -25,12 +50,37 @@ def month(request, month):
     return time(request, start=start, end=end, as_month=start)
 
 
+@login_required(login_url="/", redirect_field_name=None)
+def year(request, year):
+    """The view that summarises a year month by month. It reads the stored
+    daily totals rather than the sessions themselves. Months still to come
+    are left out unless sessions have already been put in them, and years
+    still to come don't exist."""
+
+    if not 1 <= year <= request.now.year: raise Http404
+    months = [{"date": date(year, month, 1), "minutes": 0, "days": 0}
+     for month in range(1, 13)]
+    for total in DayTotal.objects.filter(
+     user=request.user, date__year=year
+    ).by_date():
+        months[total["date"].month - 1]["minutes"] += total["total_minutes"]
+        months[total["date"].month - 1]["days"] += 1
+    months = [month for month in months
+     if month["date"] <= request.now.date() or month["days"]]
+    return render(request, "year.html", {
+     "year": year, "months": months,
+     "total": sum(month["minutes"] for month in months)
+    })
+
+
 @login_required(login_url="/", redirect_field_name=None)
 def time(request, start=None, end=None, project=None, as_month=False, all=False):
     """This view sends a list of sessions clustered into days. A few diverse
-    URLs point to it."""
+    URLs point to it. Months are sent whole, but anything else is split into
+    pages of whole days, which are moved between with the ``before`` and
+    ``after`` cursors in the query string."""
 
-    sessions = Session.objects.filter(project__user=request.user).annotate(
+    sessions = Session.objects.filter(user=request.user).annotate(
      project_id=F("project"), project_name=F("project__name")
     )
     if project:
@@ -40,14 +90,26 @@ def time(request, start=None, end=None, project=None, as_month=False, all=False)
         sessions = sessions.filter(start__gte=request.user.timezone.localize(start))
     if end:
         sessions = sessions.filter(start__lte=request.user.timezone.localize(end))
-    days = Day.group_sessions_by_local_date(sessions.order_by("start"))
-    if as_month: Day.insert_empty_month_days(days, as_month.year, as_month.month)
+    older, newer = None, None
+    if as_month:
+        days = sessions.group_by_local_date()
+        Day.insert_empty_month_days(days, as_month.year, as_month.month)
+    else:
+        try:
+            days, older, newer = Day.page(
+             sessions, PAGE_SIZE, before=request.GET.get("before"),
+             after=request.GET.get("after")
+            )
+        except ValueError: raise Http404
     return render(request, "time.html", {
-     "days": days, "project": project, "month_date": as_month
+     "days": days, "project": project, "month_date": as_month,
+     "older": older, "newer": newer
     })
 
 
 @login_required(login_url="/", redirect_field_name=None)
+@conditional_page
+@cached_page(lambda request: ["all", "list"])
 def projects(request):
     """The view that sends all projects, sorted by the user's custom sort
     order."""
@@ -56,11 +118,36 @@ def projects(request):
     return render(request, "projects.html", {"projects": projects})
 
 
+@login_required(login_url="/", redirect_field_name=None)
+def export(request):
+    """Streams a download of the user's sessions, as CSV or as JSON Lines if
+    ``format=jsonl`` is given. It can be limited to one ``project`` and to an
+    inclusive range of ``start`` and ``end`` dates. The sessions are read and
+    sent a chunk at a time, so it doesn't matter how many there are."""
+
+    format = request.GET.get("format", "csv")
+    if format not in FORMATS: raise Http404
+    try:
+        project = request.GET.get("project")
+        if project:
+            project = get_object_or_404(Project, id=int(project), user=request.user)
+        start, end = [parse_date(request.GET[key]) if request.GET.get(key)
+         else None for key in ("start", "end")]
+    except ValueError: raise Http404
+    response = StreamingHttpResponse(export_lines(sessions_to_export(
+     request.user, project=project, start=start, end=end
+    ), format), content_type=FORMATS[format])
+    response["Content-Disposition"] = 'attachment; filename="sessions.{}"'.format(
+     format
+    )
+    return response
+
+
 @login_required(login_url="/", redirect_field_name=None)
 def edit_session(request, session):
     """The view which lets users edit a session."""
 
-    session = get_object_or_404(Session, id=session, project__user=request.user)
+    session = get_object_or_404(Session, id=session, user=request.user)
     form = SessionForm(instance=session)
     if request.method == "POST":
         form = process_session_form_data(request, instance=session)
@@ -76,7 +163,7 @@ def edit_session(request, session):
 def delete_session(request, session):
     """The view which lets users delete a session."""
 
-    session = get_object_or_404(Session, id=session, project__user=request.user)
+    session = get_object_or_404(Session, id=session, user=request.user)
     if request.method == "POST":
         session.delete()
         return redirect(session.local_start().strftime("/day/%Y-%m-%d/"))